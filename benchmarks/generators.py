@@ -0,0 +1,275 @@
+"""
+==============
+generators.py
+==============
+    :Description:
+        Seeded generators for synthetic designs used by the benchmark suite.
+        A design is generated once per (size, seed) and can then be written
+        out as a KiCad s-expression netlist, a PADS netlist, an Eagle netlist,
+        a legacy .sch file or a BOM CSV file.
+
+    :Usage:
+
+        >>> from benchmarks import generators
+        >>> d = generators.make_design(10000, seed=1)
+        >>> d2 = generators.mutate_design(d, seed=2)
+        >>> generators.write_pads_netlist(d, "old.NET")
+        >>> generators.write_pads_netlist(d2, "new.NET")
+
+"""
+import csv
+import random
+
+SIZES = {
+        '1k':       1000,
+        '10k':      10000,
+        '100k':     100000,
+        '1M':       1000000,
+        }
+
+# (ref prefix, footprint, list of values, (min pins, max pins), weight)
+PART_TYPES = [
+        ('R',   'R_0402',       ['10K', '4.7K', '100R', '0R', '1K'],            (2, 2),     40),
+        ('C',   'C_0402',       ['100NF', '1UF', '10PF', '4.7UF', '22PF'],      (2, 2),     40),
+        ('L',   'L_0603',       ['10NH', '1UH', '47NH'],                        (2, 2),     6),
+        ('U',   'QFN-32',       ['LTC6946', 'ADF4351', 'AD9361', 'LMK04828'],   (8, 64),    8),
+        ('J',   'CONN_2x20',    ['HDR_2x20', 'FMC_LPC', 'SMA'],                 (2, 40),    6),
+        ]
+
+POWER_NETS = ['GND', '+3V3', '+1V8', '+5V']
+
+
+class Design(object):
+    """
+    Container for a synthetic design
+        :components (list): list of (ref, value, footprint, pin count) tuples
+        :nets (list): list of (net name, list of (ref, pin)) tuples
+    """
+    def __init__(self, components, nets, seed=None):
+        self.components = components
+        self.nets = nets
+        self.seed = seed
+
+    def num_nodes(self):
+        return sum(len(nodes) for name, nodes in self.nets)
+
+
+def _pick_part_type(rnd):
+    total = sum(p[4] for p in PART_TYPES)
+    x = rnd.uniform(0, total)
+    for p in PART_TYPES:
+        x -= p[4]
+        if x <= 0:
+            return p
+    return PART_TYPES[-1]
+
+
+def make_design(num_nodes, seed=0):
+    """
+    generate a design with approximately num_nodes connected pins
+    :Args:
+        :num_nodes (int): number of nodes (REF.PIN) to generate
+        :seed (int): random seed. the same seed always gives the same design
+    :Returns:
+        Design()
+    """
+    rnd = random.Random(seed)
+    counters = {}
+    components = []
+    pins = []
+    while len(pins) < num_nodes:
+        prefix, footprint, values, (lo, hi), w = _pick_part_type(rnd)
+        counters[prefix] = counters.get(prefix, 0) + 1
+        ref = "{}{}".format(prefix, counters[prefix])
+        num_pins = rnd.randint(lo, hi)
+        components.append((ref, rnd.choice(values), footprint, num_pins))
+        for pin in range(1, num_pins + 1):
+            pins.append((ref, pin))
+    rnd.shuffle(pins)
+
+    # a few large power nets, then many small signal nets
+    nets = []
+    idx = 0
+    n_power = len(pins) // 10
+    for k, name in enumerate(POWER_NETS):
+        size = max(2, n_power // (2 ** (k + 1)))
+        nets.append((name, pins[idx:idx + size]))
+        idx += size
+    code = 0
+    while idx < len(pins):
+        code += 1
+        size = rnd.randint(2, 6)
+        nets.append(("/N{}".format(code), pins[idx:idx + size]))
+        idx += size
+    return Design(components, nets, seed=seed)
+
+
+def mutate_design(design, seed=1, fraction=0.01):
+    """
+    return a new revision of design with a fraction of the nets changed.
+    Nodes are moved between nets, nets are renamed and parts are
+    changed in value.
+    :Args:
+        :design (Design): the design to start from
+        :seed (int): random seed
+        :fraction (float): fraction of nets and parts to touch
+    :Returns:
+        Design()
+    """
+    rnd = random.Random(seed)
+    nets = [(name, list(nodes)) for name, nodes in design.nets]
+    components = list(design.components)
+    num_changes = max(1, int(len(nets) * fraction))
+
+    for k in range(num_changes):
+        # move a node from one signal net to another
+        a = rnd.randrange(len(POWER_NETS), len(nets))
+        b = rnd.randrange(len(POWER_NETS), len(nets))
+        if a != b and len(nets[a][1]) > 2:
+            nets[b][1].append(nets[a][1].pop())
+        # rename a net
+        r = rnd.randrange(len(POWER_NETS), len(nets))
+        nets[r] = (nets[r][0] + "_R", nets[r][1])
+
+    for k in range(max(1, int(len(components) * fraction))):
+        c = rnd.randrange(len(components))
+        ref, value, footprint, num_pins = components[c]
+        components[c] = (ref, value + "_B", footprint, num_pins)
+
+    return Design(components, nets, seed=seed)
+
+
+def _open(out_file):
+    if isinstance(out_file, str):
+        return open(out_file, "w", newline="")
+    return out_file
+
+
+def write_kicad_netlist(design, out_file):
+    """
+    write design as a KiCad s-expression netlist (.net)
+    """
+    fo = _open(out_file)
+    fo.write("(export (version D)\n")
+    fo.write("  (design\n    (source synthetic.sch)\n    (tool \"kipy benchmarks\"))\n")
+    fo.write("  (components")
+    for k, (ref, value, footprint, num_pins) in enumerate(design.components):
+        fo.write("\n    (comp (ref {})\n      (value {})\n      (footprint bench:{})\n"
+                 "      (tstamp {:08X}))".format(ref, value, footprint, k))
+    fo.write(")\n")
+    fo.write("  (nets")
+    for code, (name, nodes) in enumerate(design.nets, 1):
+        fo.write("\n    (net (code {}) (name \"{}\")".format(code, name))
+        for ref, pin in nodes:
+            fo.write("\n      (node (ref {}) (pin {}))".format(ref, pin))
+        fo.write(")")
+    fo.write("))\n")
+    if isinstance(out_file, str):
+        fo.close()
+
+
+def write_pads_netlist(design, out_file):
+    """
+    write design as a PADS netlist (.NET) with *PART* and *NET* sections
+    """
+    fo = _open(out_file)
+    fo.write("*PADS-PCB*\n*PART*\n")
+    for ref, value, footprint, num_pins in design.components:
+        fo.write("{:<7s}{}\n".format(ref, footprint))
+    fo.write("\n*NET*\n")
+    for name, nodes in design.nets:
+        fo.write("*SIGNAL* {}\n".format(name.lstrip("/")))
+        line_length = 0
+        for ref, pin in nodes:
+            node = "{}.{}".format(ref, pin)
+            if (line_length + len(node) + 1) > 75:
+                fo.write("\n")
+                line_length = 0
+            fo.write(node + " ")
+            line_length += len(node) + 1
+        fo.write("\n")
+    fo.write("*END*\n")
+    if isinstance(out_file, str):
+        fo.close()
+
+
+def write_eagle_netlist(design, out_file):
+    """
+    write design as an Eagle netlist export (.NET)
+    """
+    fo = _open(out_file)
+    fo.write("Netlist\n\nExported from synthetic.sch\n\nEAGLE Version 7.7.0\n\n")
+    fo.write("Net      Part     Pad      Pin        Sheet\n\n")
+    for name, nodes in design.nets:
+        name = name.lstrip("/")
+        for k, (ref, pin) in enumerate(nodes):
+            if k == 0:
+                fo.write("{:<9s}{:<9s}{:<9}{:<11}1\n".format(name, ref, pin, pin))
+            else:
+                fo.write("         {:<9s}{:<9}{:<11}1\n".format(ref, pin, pin))
+        fo.write("\n")
+    if isinstance(out_file, str):
+        fo.close()
+
+
+def write_legacy_sch(design, out_file):
+    """
+    write the components of design as a legacy (KiCad 5) .sch file
+    """
+    fo = _open(out_file)
+    fo.write("EESchema Schematic File Version 4\n")
+    fo.write("LIBS:bench\n")
+    fo.write("EELAYER 26 0\nEELAYER END\n")
+    fo.write("$Descr A4 11693 8268\nencoding utf-8\nSheet 1 1\nTitle \"synthetic\"\n"
+             "Date \"\"\nRev \"\"\nComp \"\"\n$EndDescr\n")
+    for k, (ref, value, footprint, num_pins) in enumerate(design.components):
+        x = 1000 + (k % 100) * 100
+        y = 1000 + (k // 100) * 100
+        fo.write("$Comp\n")
+        fo.write("L bench:{} {}\n".format(value, ref))
+        fo.write("U 1 1 {:08X}\n".format(k))
+        fo.write("P {} {}\n".format(x, y))
+        fo.write("F 0 \"{}\" H {} {} 50  0000 L CNN\n".format(ref, x, y))
+        fo.write("F 1 \"{}\" H {} {} 50  0000 L CNN\n".format(value, x, y))
+        fo.write("F 2 \"bench:{}\" V {} {} 50  0001 C CNN\n".format(footprint, x, y))
+        fo.write("F 3 \"~\" H {} {} 50  0001 C CNN\n".format(x, y))
+        fo.write("\t1    {} {}\n\t1    0    0    -1\n".format(x, y))
+        fo.write("$EndComp\n")
+    fo.write("$EndSCHEMATC\n")
+    if isinstance(out_file, str):
+        fo.close()
+
+
+def write_bom_csv(design, out_file):
+    """
+    write design as a BOM CSV file in the layout read by compare_boms.BOM
+    """
+    groups = {}
+    for ref, value, footprint, num_pins in design.components:
+        groups.setdefault((value, footprint), []).append(ref)
+    fo = _open(out_file)
+    writer = csv.writer(fo)
+    writer.writerow(['Designator', 'Manufacturer', 'Part Number', 'Description', 'Value', 'Qty'])
+    for (value, footprint), refs in sorted(groups.items()):
+        writer.writerow([",".join(refs),
+                         "BENCH INC",
+                         "PN-{}-{}".format(value, footprint),
+                         "{} {}".format(value, footprint),
+                         value,
+                         len(refs)])
+    if isinstance(out_file, str):
+        fo.close()
+
+
+def write_connector_xml(design, ref, out_file):
+    """
+    write a pinout xml (attribute format) for the connector ref in design
+    """
+    num_pins = [c[3] for c in design.components if c[0] == ref][0]
+    fo = _open(out_file)
+    fo.write('<?xml version="1.0"?>\n<pinout name="{}">\n'.format(ref))
+    for pin in range(1, num_pins + 1):
+        fo.write('    <pin number="{0}" name="P{0}" description="pin {0}" />\n'.format(pin))
+    fo.write('</pinout>\n')
+    if isinstance(out_file, str):
+        fo.close()
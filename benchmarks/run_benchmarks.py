@@ -0,0 +1,341 @@
+"""
+==============
+run_benchmarks.py
+==============
+    :Description:
+        Time the main kipy code paths against synthetic designs and write
+        the results as JSON so they can be tracked across versions.
+
+    :Usage:
+
+        $ python -m benchmarks.run_benchmarks --sizes 1k,10k -o bench.json
+        $ python -m benchmarks.run_benchmarks --cases load_pads,bom_eco --sizes 100k,1M
+
+    Cases that scale quadratically (map_nets, diff_nets, compare_nodes,
+    get_pinout_from_netlist) are skipped above --max-quadratic nodes
+    and are recorded as "skipped" in the output.
+
+    With --memory, each case is run one more time under tracemalloc and
+    its peak and retained allocations are stored next to the timings.
+
+"""
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from benchmarks import generators
+
+import kipy
+from kipy import netlist_utils
+from kipy import sch_utils
+from kipy import compare_boms
+from kipy import check_nets
+from kipy.stats import Stats
+
+DEFAULT_SIZES = ['1k', '10k']
+DEFAULT_REPEAT = 3
+DEFAULT_MAX_QUADRATIC = 10000
+
+
+class Workspace(object):
+    """
+    Synthetic input files for one size, written to a temporary directory.
+    Parsed netlists are cached here so that cases that only time the
+    comparison don't include the load time.
+    """
+    def __init__(self, size_name, num_nodes, seed, tmp_dir):
+        self.size_name = size_name
+        self.num_nodes = num_nodes
+        self.dir = os.path.join(tmp_dir, size_name)
+        os.makedirs(self.dir)
+        self.old = generators.make_design(num_nodes, seed=seed)
+        self.new = generators.mutate_design(self.old, seed=seed + 1)
+        self._cache = {}
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def file(self, kind, rev='old'):
+        """
+        write (once) and return the path to the input file of the given kind
+        """
+        ext = {
+               'kicad':     '.net',
+               'pads':      '.NET',
+               'eagle':     '.eagle.NET',
+               'sch':       '.sch',
+               'bom':       '.csv',
+               }[kind]
+        fname = self.path(rev + ext)
+        if not os.path.exists(fname):
+            design = self.old if rev == 'old' else self.new
+            writer = {
+                      'kicad':  generators.write_kicad_netlist,
+                      'pads':   generators.write_pads_netlist,
+                      'eagle':  generators.write_eagle_netlist,
+                      'sch':    generators.write_legacy_sch,
+                      'bom':    generators.write_bom_csv,
+                      }[kind]
+            writer(design, fname)
+        return fname
+
+    def cached(self, key, func):
+        if key not in self._cache:
+            with quiet():
+                self._cache[key] = func()
+        return self._cache[key]
+
+    def pads_netlists(self):
+        return (self.cached('pads_old', lambda: netlist_utils.PadsNetlist(self.file('pads', 'old'))),
+                self.cached('pads_new', lambda: netlist_utils.PadsNetlist(self.file('pads', 'new'))))
+
+    def check_netlists(self):
+        return (self.cached('cn_old', lambda: _cn_load(self.file('pads', 'old'))),
+                self.cached('cn_new', lambda: _cn_load(self.file('pads', 'new'))))
+
+    def boms(self):
+        return (self.cached('bom_old', lambda: compare_boms.BOM(open(self.file('bom', 'old')))),
+                self.cached('bom_new', lambda: compare_boms.BOM(open(self.file('bom', 'new')))))
+
+    def connector(self):
+        """ return (ref, xml file) for the connector with the most pins """
+        ref = max([c for c in self.old.components if c[0].startswith('J')], key=lambda c: c[3])[0]
+        fname = self.path(ref + '.xml')
+        if not os.path.exists(fname):
+            generators.write_connector_xml(self.old, ref, fname)
+        return ref, fname
+
+
+@contextlib.contextmanager
+def quiet():
+    """ silence the diagnostic printing done by the loaders """
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            yield
+
+
+def _cn_load(fname, netlist_format='pads'):
+    with open(fname) as fi:
+        return check_nets.NetList(fi, netlist_format=netlist_format)
+
+
+######################################################################
+#       BENCHMARK CASES
+#       each case takes a Workspace and returns a callable to be timed
+######################################################################
+
+def case_load_kicad(ws):
+    fname = ws.file('kicad')
+    return lambda: netlist_utils.KicadNetlist(fname)
+
+def case_load_pads(ws):
+    fname = ws.file('pads')
+    return lambda: netlist_utils.PadsNetlist(fname)
+
+def case_map_nets(ws):
+    nl1, nl2 = ws.pads_netlists()
+    return lambda: netlist_utils.map_nets(nl1, nl2)
+
+def case_diff_nets(ws):
+    nl1, nl2 = ws.pads_netlists()
+    return lambda: netlist_utils.diff_nets(nl1, nl2)
+
+def case_compare_nodes(ws):
+    nl1, nl2 = ws.pads_netlists()
+    return lambda: netlist_utils.compare_nodes(nl1, nl2)
+
+def case_cn_load_pads(ws):
+    fname = ws.file('pads')
+    return lambda: _cn_load(fname)
+
+def case_cn_load_eagle(ws):
+    fname = ws.file('eagle')
+    return lambda: _cn_load(fname, netlist_format='eagle')
+
+def case_cn_compare(ws):
+    old, new = ws.check_netlists()
+    return lambda: old.compareNetList(new)
+
+def case_cn_comp2(ws):
+    old, new = ws.check_netlists()
+    return lambda: old.compareNetList2(new)
+
+def case_bom_load(ws):
+    fname = ws.file('bom')
+    return lambda: compare_boms.BOM(open(fname))
+
+def case_bom_eco(ws):
+    bom1, bom2 = ws.boms()
+    return lambda: bom1.calculateECO(bom2)
+
+def case_sch_parse(ws):
+    fname = ws.file('sch')
+    return lambda: sch_utils.Schematic(fname)
+
+def case_pinout(ws):
+    from kipy import pinout_tables     # needs tabula, dicttoxml, xmltodict
+    fname = ws.file('pads')
+    ref, conn_xml = ws.connector()
+    return lambda: pinout_tables.get_pinout_from_netlist(ref, fname, conn_xml)
+
+# name: (function, quadratic)
+CASES = [
+         ('load_kicad',     case_load_kicad,        False),
+         ('load_pads',      case_load_pads,         False),
+         ('map_nets',       case_map_nets,          True),
+         ('diff_nets',      case_diff_nets,         True),
+         ('compare_nodes',  case_compare_nodes,     True),
+         ('cn_load_pads',   case_cn_load_pads,      False),
+         ('cn_load_eagle',  case_cn_load_eagle,     False),
+         ('cn_compare',     case_cn_compare,        False),
+         ('cn_comp2',       case_cn_comp2,          False),
+         ('bom_load',       case_bom_load,          False),
+         ('bom_eco',        case_bom_eco,           False),
+         ('sch_parse',      case_sch_parse,         False),
+         ('pinout',         case_pinout,            True),
+         ]
+
+
+def run_case(name, func, ws, repeat, memory=False):
+    """
+    run a single case and return a dict with the results
+    """
+    res = {
+           'case':      name,
+           'size':      ws.size_name,
+           'nodes':     ws.old.num_nodes(),
+           'status':    'ok',
+           'seconds':   [],
+           }
+    try:
+        with quiet():
+            timed = func(ws)
+            for k in range(repeat):
+                t0 = time.perf_counter()
+                timed()
+                res['seconds'].append(time.perf_counter() - t0)
+            if memory:
+                st = Stats(memory=True)
+                with st.timer(name):
+                    timed()
+                res['peak_bytes'] = st.memory[name]['peak']
+                res['retained_bytes'] = st.memory[name]['retained']
+    except ImportError as err:
+        res['status'] = 'skipped'
+        res['reason'] = "missing dependency: {}".format(err)
+    except Exception as err:
+        res['status'] = 'error'
+        res['error'] = "{}: {}".format(type(err).__name__, err)
+        res['traceback'] = traceback.format_exc()
+    if res['seconds']:
+        s = sorted(res['seconds'])
+        res['min'] = s[0]
+        res['median'] = s[len(s) // 2]
+    return res
+
+
+def _git_revision():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=here,
+                                      stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, cases=None, repeat=DEFAULT_REPEAT,
+                   max_quadratic=DEFAULT_MAX_QUADRATIC, seed=0, memory=False):
+    """
+    run the benchmark cases at each size and return the results as a dict
+    :Args:
+        :sizes (list): size names from generators.SIZES
+        :cases (list): names of cases to run. If None, run all cases
+        :repeat (int): number of times each case is timed
+        :max_quadratic (int): skip quadratic cases above this many nodes
+        :seed (int): random seed for the generators
+        :memory (bool): also record peak and retained allocations of each case
+    """
+    ret = {
+           'meta': {
+                    'kipy_version':     kipy.__version__,
+                    'git_revision':     _git_revision(),
+                    'python':           platform.python_version(),
+                    'platform':         platform.platform(),
+                    'timestamp':        time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    'seed':             seed,
+                    'repeat':           repeat,
+                    'memory':           memory,
+                    },
+           'results': [],
+           }
+    tmp_dir = tempfile.mkdtemp(prefix="kipy-bench-")
+    cwd = os.getcwd()
+    os.chdir(tmp_dir)   # some of the code paths write scratch files to cwd
+    try:
+        for size_name in sizes:
+            ws = Workspace(size_name, generators.SIZES[size_name], seed, tmp_dir)
+            for name, func, quadratic in CASES:
+                if cases is not None and name not in cases:
+                    continue
+                if quadratic and ws.num_nodes > max_quadratic:
+                    res = {
+                           'case':      name,
+                           'size':      size_name,
+                           'nodes':     ws.old.num_nodes(),
+                           'status':    'skipped',
+                           'reason':    "quadratic case above {} nodes".format(max_quadratic),
+                           }
+                else:
+                    res = run_case(name, func, ws, repeat, memory=memory)
+                sys.stderr.write("{:<16}{:>6}  {:<8}{}\n".format(
+                    name, size_name, res['status'],
+                    "{:.4f} s".format(res['min']) if 'min' in res else res.get('reason', res.get('error', ''))))
+                ret['results'].append(res)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return ret
+
+
+if __name__ == '__main__':
+
+    from optparse import OptionParser
+
+    parser = OptionParser()
+    parser.add_option("--sizes", dest="sizes", default=",".join(DEFAULT_SIZES),
+                      help="Comma separated list of sizes (%s)" % ",".join(generators.SIZES))
+    parser.add_option("--cases", dest="cases", default=None,
+                      help="Comma separated list of cases (%s)" % ",".join(c[0] for c in CASES))
+    parser.add_option("--repeat", dest="repeat", default=DEFAULT_REPEAT, type="int",
+                      help="Number of times to time each case")
+    parser.add_option("--max-quadratic", dest="max_quadratic", default=DEFAULT_MAX_QUADRATIC,
+                      type="int", help="Skip quadratic cases above this many nodes")
+    parser.add_option("--seed", dest="seed", default=0, type="int",
+                      help="Random seed for the synthetic designs")
+    parser.add_option("--memory", dest="memory", default=False, action="store_true",
+                      help="Also record peak and retained memory of each case")
+    parser.add_option("-o", "--output", dest="output", default="bench_results.json",
+                      help="JSON file in which to store the results")
+
+    (options, args) = parser.parse_args()
+
+    cases = None
+    if options.cases:
+        cases = options.cases.split(",")
+    results = run_benchmarks(sizes=options.sizes.split(","),
+                             cases=cases,
+                             repeat=options.repeat,
+                             max_quadratic=options.max_quadratic,
+                             seed=options.seed,
+                             memory=options.memory)
+    with open(options.output, "w") as fo:
+        json.dump(results, fo, indent=2)
+    print("Results written to {}".format(options.output))
@@ -1,6 +1,8 @@
 # from .sch_utils import *
 # from .convert_net import *
 
+__version__ = "0.1"
+
 from . import netlist_utils
 from . import sch_utils
 from . import compare_boms
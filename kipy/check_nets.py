@@ -9,15 +9,41 @@
 # --comp2   checks only connections, ignores net names
 # --flipcheck   checks to make sure components aren't flipped (needs to pass
 #    --comp2 first
+# --pincheck    finds parts of any pin count whose pins were swapped around
 # --ignorepins  ignores R/C/L pin numbers when checking connectivity
+# --partnets    lists the nets on one or more parts, eg. U1 J2 'U*'
 #
 #  be sure to specify --format pads or --format eagle
 #
+#  netlists may be gzip, xz or bzip2 compressed (eg. design.asc.gz), they
+#  are recognized by their contents rather than the file name
+#
 #Jeff Porter
 #2013
 #
 
+from __future__ import print_function
+
+import bz2
+import codecs
+import contextlib
 import csv
+import fnmatch
+import gc
+import locale
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import re
+import zlib
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# netlist files are read in chunks of this many bytes
+READ_CHUNK_SIZE = 1 << 20
 
 class MissingNet(Exception):
     pass
@@ -36,13 +62,184 @@ class NetID(frozenset):
 
 
 class NetIndex(dict):
-    """ dictionary that can be searched by value (slowly) """
+    """ dictionary { NetID : net name } that keeps the reverse mapping
+        { net name : NetID } in sync so it can be searched by value
+        in constant time.  If several keys have the same value, the
+        first one added is found. """
+    def __init__(self,*args,**kwds):
+        dict.__init__(self)
+        self.reverse = {}
+        self._others = {}   # { value : { key : None } } for keys after the first
+        self.update(*args,**kwds)
+
+    def __setitem__(self,key,value):
+        if key in self:
+            old = dict.__getitem__(self,key)
+            if old==value:
+                return      # keep its place among keys with the same value
+            self._forget(key,old)
+        dict.__setitem__(self,key,value)
+        first = self.reverse.setdefault(value,key)
+        if first!=key:
+            self._others.setdefault(value,{})[key] = None
+
+    def __delitem__(self,key):
+        value = dict.__getitem__(self,key)
+        dict.__delitem__(self,key)
+        self._forget(key,value)
+
+    def _forget(self,key,value):
+        """ drop the reverse entry for key/value, falling back to the next
+            key added with the same value if there is one """
+        others = self._others.get(value)
+        if self.reverse.get(value)==key:
+            if others:
+                k = next(iter(others))
+                del others[k]
+                self.reverse[value] = k
+            else:
+                del self.reverse[value]
+        elif others:
+            others.pop(key,None)
+        if others is not None and not others:
+            del self._others[value]
+
+    def update(self,*args,**kwds):
+        for key,value in dict(*args,**kwds).items():
+            self[key] = value
+
+    def setdefault(self,key,value=None):
+        if key not in self:
+            self[key] = value
+        return self[key]
+
+    def pop(self,key,*default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        key,value = dict.popitem(self)
+        self._forget(key,value)
+        return key,value
+
+    def clear(self):
+        dict.clear(self)
+        self.reverse.clear()
+        self._others.clear()
+
+    def copy(self):
+        return NetIndex(self)
+
+    def __reduce__(self):
+        return (_rebuild_net_index,(dict(self),self.reverse,self._others))
+
     def find_by_value(self,item):
-        for key,value in self.iteritems():
-            if value==item:
-                return key
-        raise ValueError("Item not found: %s" % item)
+        try:
+            return self.reverse[item]
+        except KeyError:
+            raise ValueError("Item not found: %s" % item)
+
+
+def _rebuild_net_index(items,reverse,others=None):
+    """ unpickle a NetIndex without going through __setitem__ per key """
+    index = NetIndex()
+    dict.update(index,items)
+    index.reverse = reverse
+    index._others = others or {}
+    return index
+
+@contextlib.contextmanager
+def _gc_paused():
+    """ pause the cyclic garbage collector.  Loading a netlist creates
+        millions of small sets and strings (none of them in cycles) and
+        the collector would otherwise scan them over and over """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def _decompressor_factory(head):
+    """ return a function that creates a decompressor for the stream that
+        starts with the bytes in head, or None if it is not compressed """
+    if head.startswith(b'\x1f\x8b'):
+        return lambda: zlib.decompressobj(16+zlib.MAX_WBITS)
+    if head.startswith(b'\xfd7zXZ\x00'):
+        if lzma is None:
+            raise IOError("xz compressed netlists need the lzma module")
+        return lzma.LZMADecompressor
+    if head.startswith(b'BZh'):
+        return bz2.BZ2Decompressor
+    return None
+
+def _iter_chunks(stream,chunk_size):
+    """ yield the (decompressed) contents of stream in large chunks """
+    chunk = stream.read(chunk_size)
+    factory = None
+    if isinstance(chunk,bytes):
+        factory = _decompressor_factory(chunk)
+    if factory is not None:
+        decomp = factory()
+    while chunk:
+        if factory is None:
+            yield chunk
+        else:
+            while chunk:
+                if decomp.eof:
+                    # concatenated streams, eg. cat a.gz b.gz
+                    if not chunk.strip(b'\x00'):
+                        break
+                    decomp = factory()
+                yield decomp.decompress(chunk)
+                chunk = decomp.unused_data if decomp.eof else b''
+        chunk = stream.read(chunk_size)
+
+def _iter_line_blocks(fi,chunk_size,encoding=None):
+    """ yield lists of the lines read from each chunk of fi """
+    if isinstance(fi,str):
+        with open(fi,'rb') as stream:
+            for lines in _iter_line_blocks(stream,chunk_size,encoding):
+                yield lines
+        return
+    decoder = None
+    tail = ''
+    for chunk in _iter_chunks(fi,chunk_size):
+        if isinstance(chunk,bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))()
+            chunk = decoder.decode(chunk)
+        lines = (tail+chunk).split('\n')
+        tail = lines.pop()
+        yield lines
+    if decoder is not None:
+        tail += decoder.decode(b'',True)
+    if tail:
+        yield [tail]
 
+def iter_netlist_lines(fi,chunk_size=READ_CHUNK_SIZE,encoding=None):
+    """ return an iterator over the lines (without line endings) of a
+        netlist.  fi may be a file name, a binary or text stream or any
+        other iterable of lines.  Files and streams are read in chunks
+        of chunk_size and may be gzip, xz or bzip2 compressed.  A file
+        opened here is closed when the lines run out, streams are left
+        open.  Bytes are decoded with encoding, the locale's encoding
+        (as for open()) by default, and raise UnicodeDecodeError if they
+        are not valid in it. """
+    if isinstance(fi,str) or hasattr(fi,'read'):
+        return itertools.chain.from_iterable(_iter_line_blocks(fi,chunk_size,encoding))
+    return iter(fi)
+
+
+def _alpha_num_key(text):
+    """ sort key that puts U2 before U10 """
+    return [int(c) if c.isdigit() else c for c in re.split('([0-9]+)', text)]
 
 def other_pin(part):
     """ return X.1 <--> X.2 """
@@ -58,18 +255,30 @@ class NetList(object):
         
     """
     
-    def __init__(self,fi=None,netlist_format='eagle',ignorepins=False):
+    def __init__(self,fi=None,netlist_format='eagle',ignorepins=False,encoding=None):
         """ Creates a netlist object from a PADS ascii format netlist (.ASC).
+            fi is a file name or stream (see iter_netlist_lines), read with
+            encoding (the locale's encoding if None).
             Three structures are built:
             parts = dict() that maps each ref des to its part type (footprint/part num)
-            pins = dict() that maps each pin to its connected net
+            pins = dict() that maps each pin to its (first) connected net
             nets = dict() that maps net name to set() of pins that make up net's connections
             index = dict() that maps a set
+            pin_index = dict() that maps each pin to the set() of nets it is on
+            pin_conflicts = dict() that maps each pin on more than one net to
+                            the list of those nets
+            ref_index = dict() that maps each ref des to the set() of its pins
             """
         self.pins={}
         self.parts={}
         self.nets={}
         self.index=NetIndex({})
+        self.pin_index={}
+        self.ref_index={}
+        self.net_order={}
+        self.pin_conflicts={}
+        self._index2_cache={} # { tuple(ignore_pins_prefix) : index2 }
+        self.encoding=encoding
         if ignorepins:
             self.ignore_pins_prefix = ['R','C','L']
         else:
@@ -78,14 +287,29 @@ class NetList(object):
         if fi!=None:
             self.loadFile(fi,netlist_format)
 
+    @classmethod
+    def from_netlist(cls,netlist,ignorepins=False):
+        """ Creates a netlist object from a netlist already loaded by
+            kipy.netlist_utils (KicadNetlist, PadsNetlist) without parsing
+            the file again.  The sets of nodes on each net are shared with
+            netlist.list_of_nets.get_node_sets(), not copied. """
+        self = cls(ignorepins=ignorepins)
+        with _gc_paused():
+            self.nets = netlist.list_of_nets.get_node_sets()
+            comps = getattr(netlist,'list_of_comps',None)
+            if comps is not None and comps.components:
+                self.parts = comps.get_dict()
+            self.make_index()
+        return self
+
     def find_onepins(self):
         count = 0
         for n in self.nets.keys():
             if len(self.nets[n])==1:
-                print n
+                print(n)
                 count += 1
         if count==0:
-            print "** None **"
+            print("** None **")
         
         
     def indexNetList(self):
@@ -93,10 +317,10 @@ class NetList(object):
 
         
     def find_nodes_on_net(self,net):
-        for key,name in self.index2.iteritems():
-            if name==net:
-                return key
-        raise MissingNet("couldn't find net name " + net)
+        try:
+            return self.index2.find_by_value(net)
+        except ValueError:
+            raise MissingNet("couldn't find net name " + net)
     
     def _ignore_pins_on_this_ref(self,ref):
         for y in self.ignore_pins_prefix:
@@ -105,16 +329,28 @@ class NetList(object):
         return False
 
     def build_index_ignoring_certain_pins(self):
-        self.index2 = NetIndex({})
-        for key,name in self.index.iteritems():
-            nodes = []
-            for r_p in key:
-                ref,pin = r_p.split('.')
-                if self._ignore_pins_on_this_ref(ref):
-                    nodes.append( ref )
-                else:
-                    nodes.append( r_p )
-            self.index2[NetID(nodes)] = name
+        """ sets self.index2, the same as self.index but with the pin
+            numbers dropped on refs starting with one of the
+            ignore_pins_prefix.  It is built once for each set of
+            prefixes and cached until the netlist is loaded or indexed
+            again.  index2 is shared with the cache, don't modify it. """
+        prefixes = tuple(self.ignore_pins_prefix)
+        index2 = self._index2_cache.get(prefixes)
+        if index2 is None:
+            if not prefixes:
+                index2 = self.index
+            else:
+                index2 = NetIndex({})
+                for key,name in self.index.items():
+                    for r_p in key:
+                        if r_p.startswith(prefixes):
+                            key = NetID([n.split('.',1)[0] if n.startswith(prefixes) else n
+                                         for n in key])
+                            break
+                    index2[key] = name
+            self._index2_cache[prefixes] = index2
+        self.index2 = index2
+        return index2
 
     def compareNetList2(self,newNets):
         """ perform a comparison that ignores pin numbers on R,C,Ls """
@@ -122,28 +358,28 @@ class NetList(object):
             raise Exception("Can only compare NetList objects")
         self.build_index_ignoring_certain_pins()
         newNets.build_index_ignoring_certain_pins()
-        for key,name in self.index2.iteritems():
+        for key,name in self.index2.items():
             #print key,name
-            if newNets.index2.has_key(key):
+            if key in newNets.index2:
                 pass
                 #print self.index[name], "-->MATCH"
             else:
-                print "-----"
-                print name, "!!! NO MATCH"
+                print("-----")
+                print(name, "!!! NO MATCH")
                 #print "    ",key  #NetID(key)
                 try:
                     old_nodes = self.index2.find_by_value(name)
                     new_nodes = newNets.index2.find_by_value(name)
                 except ValueError:
-                    print "Unable to cross reference net",name
+                    print("Unable to cross reference net",name)
                     continue
 
                 a = old_nodes - new_nodes
                 b = new_nodes - old_nodes
                 if len(b)>0:
-                    print "Added by new",b
+                    print("Added by new",b)
                 if len(a)>0:
-                    print "Missing from new",a
+                    print("Missing from new",a)
  
     def find_flipped_parts(self,newNets):
         """ find the R,C,Ls that have pin 1/2 swapped on newNets """
@@ -154,10 +390,10 @@ class NetList(object):
         flipped_list = []
         not_flipped = 0
 
-        for key,name in self.index2.iteritems():
+        for key,name in self.index2.items():
             #print key,name
-            if not newNets.index2.has_key(key):
-                print "Warning:  Net %s does not match" % name
+            if key not in newNets.index2:
+                print("Warning:  Net %s does not match" % name)
                 continue
             #now we know the list of nodes match except possibly for pin1/2
             #situtations
@@ -168,32 +404,96 @@ class NetList(object):
                     if other_pin(node) in old_nodes:
                         flipped_list.append(node)
                     else:
-                        print "Part %s isn't flipped but isn't right, either" % node
+                        print("Part %s isn't flipped but isn't right, either" % node)
                 else:
                     not_flipped += 1
 
-        print "Total flipped parts = ",len(flipped_list)/2
-        print "Parts not flipped = ",not_flipped/2
+        print("Total flipped parts = ",len(flipped_list)//2)
+        print("Parts not flipped = ",not_flipped//2)
 
         flipped_list = sorted(flipped_list)
 
         flipped_list = [flipped_list[x] for x in range(0,len(flipped_list),2)]
-        print "Flipped parts:"
+        print("Flipped parts:")
         for f in flipped_list:
-            print f.split('.')[0],
-        print
+            print(f.split('.')[0], end=' ')
+        print()
+
+    def find_permuted_parts(self,newNets):
+        """ find the parts on newNets whose pins were permuted: the part
+            has the same pins connected to the same nets, but not to the
+            same pins (flipped R/C/Ls, swapped diff pairs, rotated
+            connectors, FPGA pin swaps).  Nets are matched by name, or by
+            their connections if they were renamed.  A net that was
+            renamed and had its pins changed is matched to the new net
+            that has more than half of its pins.
+            Returns a list sorted by ref des of dicts
+                { 'ref': ref des, 'pins': [(pin, old net, new net), ...] }
+            listing only the pins whose net changed. """
+        if not isinstance(newNets,NetList):
+            raise Exception("Can only compare NetList objects")
+        rename = {}
+        for name in self.nets:
+            if name not in newNets.nets:
+                new_name = newNets.index.get(self.index.reverse.get(name))
+                if new_name is not None:
+                    rename[name] = new_name
+        claimed = set(rename.values())
+        for name,pins in self.nets.items():
+            if name in rename or name in newNets.nets:
+                continue
+            votes = Counter()
+            for p in pins:
+                for n in newNets.pin_index.get(p,()):
+                    if n not in self.nets and n not in claimed:
+                        votes[n] += 1
+            if votes:
+                new_name,n = votes.most_common(1)[0]
+                if 2*n>len(pins):
+                    rename[name] = new_name
+                    claimed.add(new_name)
+        res = []
+        for ref,pins in self.ref_index.items():
+            if newNets.ref_index.get(ref)!=pins:
+                continue # pins added or removed, not a permutation
+            changed = []
+            for p in pins:
+                old_nets = frozenset([rename.get(n,n) for n in self.pin_index[p]])
+                new_nets = frozenset(newNets.pin_index[p])
+                if old_nets!=new_nets:
+                    changed.append( (p,old_nets,new_nets) )
+            if changed and Counter(c[1] for c in changed)==Counter(c[2] for c in changed):
+                changed.sort(key=lambda c:_alpha_num_key(c[0]))
+                res.append({'ref': ref,
+                            'pins': [(p,','.join(sorted(a)),','.join(sorted(b))) for p,a,b in changed]})
+        res.sort(key=lambda r:_alpha_num_key(r['ref']))
+        return res
 
     def find_nets_on_part(self,ref_des):
         """  returns a list of (pin,net) tuples for pins of the given
              ref_des.  Note that the pin name should be of the format
              REFDES.PIN in order for the matching to work correctly. """
-
-        ref_des = ref_des.upper() + "."
         res = []
-        for net_name,net_pins in self.nets.iteritems():
-            for p in net_pins:
-                if p.startswith(ref_des):
-                    res.append( (p,net_name) )
+        for p in sorted(self.ref_index.get(ref_des.upper(),()),key=_alpha_num_key):
+            for net_name in sorted(self.pin_index[p],key=self.net_order.__getitem__):
+                res.append( (p,net_name) )
+        return res
+
+    def find_nets_on_parts(self,ref_des_list):
+        """  returns a dict { ref_des : [(pin,net), ...] } for every part
+             matching one of the ref des in ref_des_list.  Entries may be
+             globs such as U* or J1?.  Parts are in the order they are
+             given, parts matching a glob are sorted numerically. """
+        res = {}
+        for pattern in ref_des_list:
+            pattern = pattern.upper()
+            if any(c in pattern for c in '*?['):
+                refs = sorted(fnmatch.filter(self.ref_index,pattern),key=_alpha_num_key)
+            else:
+                refs = [pattern]
+            for ref in refs:
+                if ref not in res:
+                    res[ref] = self.find_nets_on_part(ref)
         return res
             
     def compareNetList(self,newNets,ignoreNames=False):
@@ -201,13 +501,13 @@ class NetList(object):
         if not isinstance(newNets,NetList):
             raise Exception("Can only compare NetList objects")
         verifiedChanges = set([])
-        for net_pins,net_name in self.index.iteritems():
-            if newNets.index.has_key(net_pins):
+        for net_pins,net_name in self.index.items():
+            if net_pins in newNets.index:
                 if newNets.index[net_pins]==net_name: # nets match contents and name
                     continue
                 else: # net contents match but name is different
                     if not ignoreNames:
-                        print "Net %s name changed from %s to %s." % (net_pins,net_name,newNets.index[net_pins])
+                        print("Net %s name changed from %s to %s." % (net_pins,net_name,newNets.index[net_pins]))
             else: # net contents do not match
                 closest_new_net_name = newNets.findClosestMatch( net_pins, net_name )
                 if closest_new_net_name != None:
@@ -228,31 +528,37 @@ class NetList(object):
                         name = net_name
                     else:
                         name = "%s %s/%s" % (net_pins,net_name,closest_new_net_name)
-                    print "Net %s %s%s%s." % (name, newNodes,connector,oldNodes)
+                    print("Net %s %s%s%s." % (name, newNodes,connector,oldNodes))
 
                     verifiedChanges.add( closest_new_net_name )
                 else:
                     if len(self.nets[net_name])>1:
-                        print "Net %s (%s) is not present in new netlist." % (net_pins,net_name)
+                        print("Net %s (%s) is not present in new netlist." % (net_pins,net_name))
                     
         #check to see if anything left in the new netlist that hasn't been checked           
         for key in newNets.index:
-            if not self.index.has_key(key) and not newNets.index[key] in verifiedChanges:
-                print "Net %s (%s) is in the new netlist but not the original" % (key,newNets.index[key])
+            if key not in self.index and not newNets.index[key] in verifiedChanges:
+                print("Net %s (%s) is in the new netlist but not the original" % (key,newNets.index[key]))
+
+    def _candidate_nets(self, pin_list):
+        """ return the names of the nets that share at least one pin with
+            pin_list, in the same order as self.nets """
+        names = set()
+        for p in pin_list:
+            names.update(self.pin_index.get(p,()))
+        return sorted(names, key=self.net_order.__getitem__)
 
     def findClosestMatch(self, pin_list, net_name):
         # if there is a matching netname...
-        if self.nets.has_key( net_name ):
+        if net_name in self.nets:
             return net_name   
         else:
-            # look through to see which nets might match
+            # look through the nets that share a pin to see which might match
             best_score = 0
             best_match = None
-            for name,pins in self.nets.iteritems():
-                #if no pins in common, bail
+            for name in self._candidate_nets(pin_list):
+                pins = self.nets[name]
                 c = len(pin_list & pins)
-                if c==0:
-                    continue
                 #see if one adds nets to the other
                 a = len(pin_list - pins)
                 b = len(pins - pin_list)
@@ -269,23 +575,35 @@ class NetList(object):
 
 
     def loadFile(self,fi,netlist_format):
-        if netlist_format.lower()=='eagle':
-            self.loadFile_Eagle(fi)
-        elif netlist_format.lower()=='pads':
-            self.loadFile_Pads(fi)
-        else:
-            raise Exception("Unknown format '%s'" % netlist_format)
+        with _gc_paused():
+            if netlist_format.lower()=='eagle':
+                self.loadFile_Eagle(fi)
+            elif netlist_format.lower()=='pads':
+                self.loadFile_Pads(fi)
+            else:
+                raise Exception("Unknown format '%s'" % netlist_format)
+        if self.pin_conflicts:
+            print("Warning:  %d pins are assigned to multiple nets (see pin_conflicts)" % len(self.pin_conflicts))
+
+    def write_pin_conflicts(self,fo):
+        """ write the pins that are on more than one net to a CSV file
+            with a Pin and Nets column, nets are separated by spaces.
+            fo is a file name or open file """
+        if isinstance(fo,str):
+            with open(fo,'w',newline='') as f:
+                return self.write_pin_conflicts(f)
+        writer = csv.writer(fo)
+        writer.writerow(['Pin','Nets'])
+        for pin in sorted(self.pin_conflicts,key=_alpha_num_key):
+            writer.writerow([pin,' '.join(self.pin_conflicts[pin])])
     
     def loadFile_Eagle(self,fi):
         """ load the .NET netlist file from eagle """
-        self.parts = {}
-        self.nets = {}
-        self.pins = {}
+        self._start_loading()
         state = 'skip_header'
-        assert self.ignore_pins_prefix==None,"Not supported in Eagle yet"
         lineNum = 0
         net = None
-        for txt in fi:
+        for txt in iter_netlist_lines(fi,encoding=self.encoding):
             lineNum +=1
             tokens=txt.split()
             if state.startswith('skip_header'):
@@ -315,27 +633,27 @@ class NetList(object):
                         continue
                     self.parts[tokens[1]]=tokens[1]
                     net = tokens[0]
-                    self.nets[net] = set([tokens[1]+"."+tokens[2]])
+                    self._add_net(net)
+                    self._add_pins(net,[tokens[1]+"."+tokens[2]])
                     state='add_pins'
                 elif state=='add_pins':
                     if len(tokens)==0:
+                        self._index_net(net)
                         state='find_net'
                     else:
                         self.parts[tokens[0]]=tokens[0]
-                        self.nets[net] |= set([tokens[0]+"."+tokens[1]])
-            
-        self.make_index()
+                        self._add_pins(net,[tokens[0]+"."+tokens[1]])
+        if state=='add_pins':
+            self._index_net(net)
         
     def loadFile_Pads(self,fi):
         """ Load the ASCII netlist file (parts and connections,
             constraints are ignored) """
-        self.parts = {} # dict { refdes : partNumber/footprint }  optional
-        self.nets = {} # dict  { netname1 : set(pin list1), ... }
-        self.pins = {} # dict { pin : net } for checking if pin is on multiple nets
+        self._start_loading()
         state = 'findparts'
         lineNum = 0
         net = None
-        for txt in fi:
+        for txt in iter_netlist_lines(fi,encoding=self.encoding):
             lineNum += 1
             txt = txt.strip()
             if state=='findparts':
@@ -346,6 +664,8 @@ class NetList(object):
             elif state=='readparts':
                 if txt.startswith('*CONNECTION*') or txt.startswith('*NET*'):
                     state = 'readnets'
+                elif txt=='':
+                    continue
                 elif txt[0]=='*':
                     raise InvalidFormat(lineNum,'Unexpected keyword %s' % txt)
                 else:
@@ -360,35 +680,160 @@ class NetList(object):
                     continue
                 else:
                     if res[0][0]=='*':
+                        if net!=None:
+                            self._index_net(net)
+                            net = None
                         if res[0]=='*END*' or res[0]=='*MISC*':
                             state='done'
                         elif not res[0] in ['*SIGNAL*','*SIG*'] or len(res)!=2:
                             raise InvalidFormat(lineNum,'*SIGNAL <NET> expected')
                         else:
                             net = res[1]
-                            self.nets[net]=set([])
+                            self._add_net(net)
                     else:
                         #if self.ignore_pins_prefix:
                         #    res = removePinNumbers(res, self.ignore_pins_prefix)
                         if net==None:
                             raise InvalidFormat(lineNum,'Expected *SIGNAL*')
-                        self.nets[net] |= set(res)
-                        for r in res:
-                            if self.pins.has_key(r):
-                                if self.pins[r] != net:
-                                    print "Warning:  Pin %s is assigned to multiple nets: %s and %s" % (
-                                        r, self.pins[r], net)
-                            else:
-                                self.pins[r] = net
+                        self._add_pins(net,res)
             if state=='done':
                 break
+        if net!=None:
+            self._index_net(net)
+
+    def _start_loading(self):
+        self.parts = {} # dict { refdes : partNumber/footprint }  optional
+        self.nets = {} # dict  { netname1 : set(pin list1), ... }
+        self.pins = {} # dict { pin : first net it is on }
+        self.index = NetIndex({})
+        self.pin_index = {}
+        self.ref_index = {}
+        self.net_order = {}
+        self.pin_conflicts = {} # dict { pin : [nets] } for pins on multiple nets
+        self._index2_cache = {}
+
+    def _add_net(self,net):
+        """ start a new (empty) net while loading.  A net that appears
+            again in the file replaces the earlier one """
+        if net in self.nets:
+            old = self.nets[net]
+            key = NetID(old)
+            if self.index.get(key)==net:
+                del self.index[key]
+            for p in old:
+                nets = self.pin_index[p]
+                nets.discard(net)
+                if not nets:
+                    del self.pin_index[p]
+                    del self.pins[p]
+                    self._forget_pin(p)
+                elif p in self.pin_conflicts:
+                    self.pin_conflicts[p].remove(net)
+                    if len(nets)==1:
+                        del self.pin_conflicts[p]
+                    if self.pins[p]==net:
+                        self.pins[p] = self._net_on_pin(p)
+        else:
+            self.net_order[net] = len(self.net_order)
+        self.nets[net] = set([])
+
+    def _add_pins(self,net,pins):
+        self.nets[net].update(pins)
+        pin_index = self.pin_index
+        ref_index = self.ref_index
+        for p in pins:
+            nets = pin_index.get(p)
+            if nets is None:
+                pin_index[p] = set([net])
+                self.pins[p] = net
+                ref = p.split('.',1)[0]
+                refs = ref_index.get(ref)
+                if refs is None:
+                    ref_index[ref] = set([p])
+                else:
+                    refs.add(p)
+            elif net not in nets:
+                nets.add(net)
+                conflict = self.pin_conflicts.get(p)
+                if conflict is None:
+                    self.pin_conflicts[p] = sorted(nets,key=self.net_order.__getitem__)
+                else:
+                    conflict.append(net)
+
+    def _forget_pin(self,p):
+        ref = p.split('.',1)[0]
+        pins = self.ref_index[ref]
+        pins.discard(p)
+        if not pins:
+            del self.ref_index[ref]
+
+    def _index_net(self,net):
+        """ add a net to the index once all of its pins are loaded """
+        self.index[NetID(self.nets[net])] = net
 
-        self.make_index()
-        
     def make_index(self):   
         #build an index from connections to net name (helps in finding nets that get renamed)
-        for net,pins in self.nets.iteritems():
+        #the loaders build it as they go, this rebuilds it from self.nets
+        self.index = NetIndex({})
+        self._index2_cache = {}
+        for net,pins in self.nets.items():
             self.index[NetID(pins)] = net
+        self.make_pin_index()
+
+    def make_pin_index(self):
+        #build an index from each pin to the nets it is on (limits the nets
+        #scored by findClosestMatch to those that share a pin) and from each
+        #ref des to its pins
+        self.pins = {}
+        self.pin_index = {}
+        self.ref_index = {}
+        self.net_order = {}
+        self.pin_conflicts = {}
+        for k,(net,pins) in enumerate(self.nets.items()):
+            self.net_order[net] = k
+            self._add_pins(net,pins)
+
+    def _net_on_pin(self,pin):
+        """ return the first net pin is on, or None """
+        nets = self.pin_index.get(pin)
+        if not nets:
+            return None
+        return min(nets,key=self.net_order.__getitem__)
+
+    def _check_pin(self,pin,net):
+        """ check the net a CSV file assigns to pin against the netlist.
+            Returns (status, net in netlist) where status is one of
+            'ok', 'nc', 'no_such_net', 'not_connected' or 'not_in_csv' """
+        if net!='':
+            if net not in self.nets:
+                return 'no_such_net',self._net_on_pin(pin)
+            elif not pin in self.nets[net]:
+                return 'not_connected',self._net_on_pin(pin)
+            return 'ok',net
+        actual = self._net_on_pin(pin)
+        if actual!=None and actual[0]!='$':
+            return 'not_in_csv',actual
+        return 'nc',None
+
+    def _pin_rows(self,csvfile,columns,bad_rows):
+        """ yield (line number, [values of columns]) for the rows of a
+            pin list CSV file, stripped.  Raises InvalidFormat if a column
+            is missing from the header.  Rows that are short or have an
+            empty value in any column but the last (the net, empty if not
+            connected) are skipped and added to bad_rows as
+            (line number, message) """
+        reader = csv.DictReader(csvfile)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise InvalidFormat(reader.line_num,'Expected %s column(s) in pin list' % ', '.join(missing))
+        for row in reader:
+            values = [row[c] for c in columns]
+            if None in values:
+                bad_rows.append((reader.line_num,'Expected %d columns' % len(reader.fieldnames)))
+            elif not all(v.strip() for v in values[:-1]):
+                bad_rows.append((reader.line_num,'Expected %s' % ' and '.join(columns[:-1])))
+            else:
+                yield reader.line_num,[v.strip() for v in values]
 
     def comparePart(self, csvfile, ref_des, showNC=False):
         """ compares entries for the given ref_des with the net assignments
@@ -397,27 +842,91 @@ class NetList(object):
         errors = 0
         ok = 0
         nc_count = 0
-        for row in csv.DictReader(csvfile):
-            pin = '%s.%s' % (ref_des,row['Pin'])
-            net = row['Net']
-            if net!='':
-                if not self.nets.has_key(net):
-                    print "%s: No such net %s in netlist" %(pin, net)
-                    errors += 1
-                elif not pin in self.nets[net]:
-                    print "%s: Not connected to net %s" % (pin,net)
-                    errors += 1
-                else:
-                    ok += 1
-            elif self.pins.has_key(pin) and self.pins[pin][0]!='$':
-                errors += 1
-                print "%s:  Net %s assigned in netlist but not CSV." % (pin,self.pins[pin])
-            else:
+        bad_rows = []
+        for line,(pin,net) in self._pin_rows(csvfile,('Pin','Net'),bad_rows):
+            pin = '%s.%s' % (ref_des,pin)
+            status,actual = self._check_pin(pin,net)
+            if status=='ok':
+                ok += 1
+            elif status=='nc':
                 nc_count +=1
                 if showNC:
-                    print "%s: not assigned" % pin
+                    print("%s: not assigned" % pin)
+            else:
+                errors += 1
+                if status=='no_such_net':
+                    print("%s: No such net %s in netlist" %(pin, net))
+                elif status=='not_connected':
+                    print("%s: Not connected to net %s" % (pin,net))
+                else:
+                    print("%s:  Net %s assigned in netlist but not CSV." % (pin,actual))
+        for line,msg in bad_rows:
+            print("Warning:  Ignoring line %d: %s" % (line,msg))
+
+        print("Netlist/CSV check completed.  %d mismatches, %d verified, %d not connected" % (errors,ok, nc_count))
+
+    def verify_pins(self, csvfile, ref_col='RefDes', pin_col='Pin', net_col='Net'):
+        """ checks the net assignments for any number of parts in a CSV
+            file against the netlist in a single pass.  Each row of the
+            CSV file gives the RefDes, Pin and Net (empty if not
+            connected) of one pin.
+            :Args:
+                :csvfile (str or file): CSV file name or open file
+                :ref_col, pin_col, net_col (str): column names
+            :Returns (dict):
+                'mismatches': list of dicts for each pin that doesn't match
+                              { 'ref', 'pin', 'net' (in CSV),
+                                'netlist_net', 'status' }
+                              where status is 'no_such_net', 'not_connected'
+                              or 'not_in_csv'
+                'totals':     dict with the number of 'rows', 'mismatches',
+                              'verified' and 'not_connected' pins
+                'bad_rows':   list of (line number, message) for rows that
+                              were skipped because they are short or have
+                              no RefDes or Pin
+            Raises InvalidFormat if a column is missing from the header """
+        if isinstance(csvfile,str):
+            with open(csvfile) as fi:
+                return self.verify_pins(fi,ref_col,pin_col,net_col)
+        mismatches = []
+        totals = {'rows': 0, 'mismatches': 0, 'verified': 0, 'not_connected': 0}
+        bad_rows = []
+        for line,(ref,pin,net) in self._pin_rows(csvfile,(ref_col,pin_col,net_col),bad_rows):
+            totals['rows'] += 1
+            status,actual = self._check_pin('%s.%s' % (ref,pin),net)
+            if status=='ok':
+                totals['verified'] += 1
+            elif status=='nc':
+                totals['not_connected'] += 1
+            else:
+                totals['mismatches'] += 1
+                mismatches.append({'ref': ref, 'pin': pin, 'net': net,
+                                   'netlist_net': actual, 'status': status})
+        return {'mismatches': mismatches, 'totals': totals, 'bad_rows': bad_rows}
+
+
+def _load_netlist(job):
+    fi,netlist_format,ignorepins,encoding = job
+    return NetList(fi,netlist_format=netlist_format,ignorepins=ignorepins,encoding=encoding)
 
-        print "Netlist/CSV check completed.  %d mismatches, %d verified, %d not connected" % (errors,ok, nc_count)
+def load_netlists(files,netlist_format='eagle',ignorepins=False,parallel=True,encoding=None):
+    """ load several netlist files and return a list of NetList objects.
+        With parallel=True each file is parsed in its own process and the
+        loaded NetList (indexes included) is pickled back to this one.
+        Falls back to loading one after the other if processes can't be
+        started.
+        Rebuilding the pickled objects costs about two thirds of parsing
+        the file, so this only pays off with large netlists on a machine
+        with idle cores. """
+    jobs = [(f,netlist_format,ignorepins,encoding) for f in files]
+    if parallel and len(jobs)>1:
+        try:
+            with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+                with _gc_paused():
+                    return list(pool.map(_load_netlist,jobs))
+        except (OSError,NotImplementedError,BrokenProcessPool):
+            pass
+    return [_load_netlist(job) for job in jobs]
 
 
 def removePinNumbers(list_of_pins, refs_to_ignore):
@@ -450,18 +959,26 @@ if __name__=='__main__':
     parser.add_option("--flipcheck", dest="flipcheck", 
                        default=False, action="store_true",
                        help="Compare for flipped parts (OLD / NEW)")
+    parser.add_option("--pincheck", dest="pincheck",
+                       default=False, action="store_true",
+                       help="Find parts with permuted pins (OLD / NEW)")
     parser.add_option("--partnets", dest="partnets",
                       default=False, action="store_true",
-                      help="Display nets connected to given part (REFDES)")
+                      help="Display nets connected to given parts (NETLIST REFDES [REFDES...])")
     
     parser.add_option("--checkpart", dest="checkpart", 
                        default=False, action="store_true",
                        help="Check connections on a part (NET and CSV and REF)")
+    parser.add_option("--checkpins", dest="checkpins",
+                       default=False, action="store_true",
+                       help="Check connections on many parts (NET and CSV with RefDes, Pin, Net columns)")
     parser.add_option("--showNC", dest="showNC", default=False,
                       action="store_true",
                       help="Display NC pins when checking parts against CSV")
     parser.add_option("--format", dest="format", default='pads',
                       help="Netlist format (pads or eagle)")
+    parser.add_option("--encoding", dest="encoding", default=None,
+                      help="Netlist file encoding (default is the locale's)")
 
     parser.add_option("--ignorepins", dest="ignorepins", default=False,
                       action="store_true",
@@ -469,6 +986,12 @@ if __name__=='__main__':
     parser.add_option("--ignorenames", dest="ignorenames", default=False,
                       action="store_true",
                       help="Ignore net names during comparison")
+    parser.add_option("--conflicts", dest="conflicts", default=False,
+                      action="store_true",
+                      help="List pins on multiple nets (NETLIST [CSV])")
+    parser.add_option("--parallel", dest="parallel", default=False,
+                      action="store_true",
+                      help="Load OLD and NEW netlists in separate processes")
     parser.add_option("--1pin", dest="onepin", default=False,
                       action="store_true",
                       help="Print a list of 1-pin nets")
@@ -476,34 +999,69 @@ if __name__=='__main__':
     (options,args) = parser.parse_args()
 
 
-    if options.compare or options.comp2 or options.flipcheck:
+    if options.compare or options.comp2 or options.flipcheck or options.pincheck:
         if len(args)!=2:
-            print "Must specify OLD and NEW netlists"
+            print("Must specify OLD and NEW netlists")
         else:
-            old = NetList(open(args[0]),netlist_format=options.format,ignorepins=options.ignorepins)
-            new = NetList(open(args[1]),netlist_format=options.format,ignorepins=options.ignorepins)
+            old,new = load_netlists(args,netlist_format=options.format,ignorepins=options.ignorepins,
+                                    parallel=options.parallel,encoding=options.encoding)
             if options.compare:
                 old.compareNetList(new,options.ignorenames)
             elif options.comp2:
                 old.compareNetList2(new)
             elif options.flipcheck:
                 old.find_flipped_parts(new)
+            elif options.pincheck:
+                parts = old.find_permuted_parts(new)
+                for part in parts:
+                    print("%s:" % part['ref'])
+                    for pin,old_net,new_net in part['pins']:
+                        print("    %-16s %s -> %s" % (pin,old_net,new_net))
+                print("Total parts with permuted pins = ",len(parts))
     elif options.checkpart:
         if len(args)!=3:
-            print "Must specify NETLIST and CSV file and REFDES"
+            print("Must specify NETLIST and CSV file and REFDES")
         else:
-            net = NetList(open(args[0]))
+            net = NetList(args[0],netlist_format=options.format,encoding=options.encoding)
             net.comparePart( open(args[1]), args[2], showNC=options.showNC )
-    elif options.partnets:
+    elif options.checkpins:
         if len(args)!=2:
-            print "Must specify NETLIST and REFDES"
+            print("Must specify NETLIST and CSV file")
         else:
-            netlist = NetList(open(args[0]),netlist_format=options.format,ignorepins=options.ignorepins)
-            nets = netlist.find_nets_on_part( args[1] )
-            for n in nets:
-                print "%-16s %s" % (n[0],n[1])
+            net = NetList(args[0],netlist_format=options.format,encoding=options.encoding)
+            res = net.verify_pins( args[1] )
+            messages = {'no_such_net': "No such net %(net)s in netlist",
+                        'not_connected': "Not connected to net %(net)s (netlist has %(netlist_net)s)",
+                        'not_in_csv': "Net %(netlist_net)s assigned in netlist but not CSV."}
+            for m in res['mismatches']:
+                print("%s.%s: %s" % (m['ref'],m['pin'],messages[m['status']] % m))
+            for line,msg in res['bad_rows']:
+                print("Warning:  Ignoring line %d: %s" % (line,msg))
+            print("Netlist/CSV check completed.  %(mismatches)d mismatches, %(verified)d verified, %(not_connected)d not connected" % res['totals'])
+    elif options.partnets:
+        if len(args)<2:
+            print("Must specify NETLIST and REFDES")
+        else:
+            netlist = NetList(args[0],netlist_format=options.format,ignorepins=options.ignorepins,encoding=options.encoding)
+            parts = netlist.find_nets_on_parts( args[1:] )
+            for ref,nets in parts.items():
+                if len(parts)>1:
+                    print("%s:" % ref)
+                for n in nets:
+                    print("%-16s %s" % (n[0],n[1]))
+            
+    elif options.conflicts:
+        if len(args) not in (1,2):
+            print("Must specify NETLIST and optional output CSV file")
+        else:
+            netlist = NetList(args[0],netlist_format=options.format,encoding=options.encoding)
+            if len(args)==2:
+                netlist.write_pin_conflicts(args[1])
+            else:
+                for pin in sorted(netlist.pin_conflicts,key=_alpha_num_key):
+                    print("%-16s %s" % (pin,' '.join(netlist.pin_conflicts[pin])))
             
     if options.onepin:
-        nets = NetList(open(args[0]),netlist_format=options.format,ignorepins=options.ignorepins)
+        nets = NetList(args[0],netlist_format=options.format,ignorepins=options.ignorepins,encoding=options.encoding)
         nets.find_onepins()
         
@@ -25,6 +25,16 @@ compare_boms.py
 >>>   >> generates text description of changes
 >>> python compare_boms.py --eco eco.csv bom1.csv bom2.csv
 >>>    >> generates eco.csv file with formatted list of updates to go from bom1.csv to bom2.csv
+>>> python compare_boms.py --matrix matrix.csv var1.csv var2.csv var3.csv
+>>>    >> generates matrix.csv with the part number of each ref des in each BOM variant
+>>> python compare_boms.py --explode buy.csv top.csv sub1.csv sub2.csv
+>>>    >> writes the total quantity of each part to build top.csv, where sub1 and sub2 are
+>>>       sub-assemblies listed in top.csv (or each other) by their file name as part number
+>>> python compare_boms.py --batch manifest.csv
+>>>    >> writes the ECO of every OLD,NEW,ECO row of manifest.csv, several at a time
+
+>>> variants = compare_boms.VariantMatrix([bomA, bomB, bomC], names=['A', 'B', 'C'])
+>>> eco = variants.calculateECO('A', 'C')  # same as bomA.calculateECO(bomC)
 
 
 History:
@@ -46,16 +56,31 @@ History:
 
 """
 
+import bisect
 import csv
+import heapq
+import json
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 import sys
 
+try:
+    from . import value_utils
+except ImportError:     # run as a script
+    import value_utils
+
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 class BadRefDes(Exception):
     pass
 
+class BOMCycle(Exception):
+    pass
+
 
 BOM_column_headings = { 'PartNumber' : ['Part Number', 'Manufacturer Part Number',
                                         'Manufacturer Part Number 1', 'PartNumber'],
@@ -65,7 +90,18 @@ BOM_column_headings = { 'PartNumber' : ['Part Number', 'Manufacturer Part Number
                         'Comment' : ['Comment'],
                         'RefDes' : ['Designator','RefDes','Ref Des'],
                         'Qty' : ['Qty','Quantity'],
-                        'Fitted' : ['Fitted'] }
+                        'Fitted' : ['Fitted'],
+                        'Footprint' : ['Footprint','PCB Footprint','Package'] }
+
+# upper case aliases for each heading, used to find the header row
+BOM_heading_aliases = dict((k,frozenset([w.upper() for w in words]))
+                           for k,words in BOM_column_headings.items())
+
+# columns that must be present in the header row
+BOM_required_columns = ('PartNumber','Manufacturer','RefDes','Qty')
+
+# delimiters tried when looking for the header row (CSV, TSV, European CSV)
+BOM_delimiters = (',','\t',';')
 
 mfg_aliases = { 'TDK CORPORATION' : 'TDK',
                 'SKYWORKS SOLUTIONS INC' : 'SKYWORKS',
@@ -84,67 +120,339 @@ mfg_aliases = { 'TDK CORPORATION' : 'TDK',
                 'ANALOG DEVICES' : 'ANALOG',
                 'ABRACON CORPORATION' : 'ABRACON' }
 
+# company legal forms dropped from the end of manufacturer names when comparing
+# them.  Only one is dropped (CO LTD counts as one), and only when it is a word
+# of its own after whitespace, a comma or a period
+mfg_suffixes = frozenset(['INC','INCORPORATED','CORP','CORPORATION','CO','COMPANY',
+                          'LTD','LIMITED','LLC','GMBH','AG','SA','PLC','KK'])
+
+_mfg_legal_form_re = re.compile(r'(?<=[^\s.,])[\s.,]+(?:CO[\s.,]+)?(?:%s)\.?$' %
+                                '|'.join(sorted(mfg_suffixes,key=len,reverse=True)))
+_mfg_punctuation_re = re.compile(r'[^A-Z0-9&]+')
+_mfg_alias_table = None # { normalized name : canonical name }, built from mfg_aliases
+_mfg_canonical = {}     # { manufacturer as given : canonical name }
+_mfg_ids = {'': 0}      # { canonical name : integer id }
+
+def _normalize_mfg(name):
+    """ upper case, trailing legal form dropped and punctuation removed """
+    name = _mfg_legal_form_re.sub('',name.upper().strip())
+    return ' '.join(_mfg_punctuation_re.sub(' ',name).split())
+
+def _build_mfg_alias_table():
+    table = {}
+    for alias,name in mfg_aliases.items():
+        table[_normalize_mfg(alias)] = _normalize_mfg(name)
+    return table
+
+def canonical_mfg(name):
+    """ return the canonical form of a manufacturer name.  Each distinct
+        name is worked out once and cached """
+    try:
+        return _mfg_canonical[name]
+    except KeyError:
+        pass
+    global _mfg_alias_table
+    if _mfg_alias_table is None:
+        _mfg_alias_table = _build_mfg_alias_table()
+    normalized = _normalize_mfg(name)
+    canonical = _mfg_alias_table.get(normalized,normalized)
+    _mfg_canonical[name] = canonical
+    return canonical
+
+def mfg_id(name):
+    """ return an integer that is the same for manufacturer names that
+        compare_mfg() considers equal """
+    canonical = canonical_mfg(name)
+    try:
+        return _mfg_ids[canonical]
+    except KeyError:
+        _mfg_ids[canonical] = len(_mfg_ids)
+        return _mfg_ids[canonical]
+
+def add_mfg_aliases(aliases):
+    """ add { alias : manufacturer } entries to mfg_aliases.  Parts
+        that are already loaded see the new aliases too, Part.mfg_id is
+        looked up when it is used """
+    global _mfg_alias_table
+    mfg_aliases.update(aliases)
+    _mfg_alias_table = None
+    _mfg_canonical.clear()
+
+def load_mfg_aliases(fi):
+    """ add manufacturer aliases from a CSV file (name or file object)
+        with ALIAS,MANUFACTURER on each line.  Lines starting with # are
+        ignored """
+    if isinstance(fi,str):
+        with open(fi) as f:
+            return load_mfg_aliases(f)
+    aliases = {}
+    for row in csv.reader(fi):
+        if len(row)<2 or row[0].strip().startswith('#'):
+            continue
+        aliases[row[0].strip()] = row[1].strip()
+    add_mfg_aliases(aliases)
+
 def compare_mfg(a,b):
-    def alias(x):
-        return mfg_aliases.get(x.upper()) or x.upper()
-    return alias(a) == alias(b)        
+    return mfg_id(a) == mfg_id(b)
                 
                 
                 
 
+def parts_differ(oldpart,newpart):
+    """ True if a ref des needs an ECO line going from oldpart to newpart.
+        Values are compared with value_utils.values_equal() so 1UF and
+        1.0UF are the same value """
+    return (newpart.partnumber!=oldpart.partnumber or
+            newpart.mfg_id != oldpart.mfg_id or
+            not value_utils.values_equal(newpart.value,oldpart.value))
+
+
 def run_bom_compare(bomA,bomB,eco_file):
     """
+    write the ECO to go from bomA to bomB to eco_file (CSV) and close it
     """
-    lst = bomA.ECOtoList(bomB)
-    header = "action,ref,old manufacturer,old part number,old value,,new manufacturer,new part number,new value\n"
-    eco_file.write(header)
-    for line in lst:
-        eco_file.write(line + '\n')
+    write_eco(iter_eco_rows(bomA.calculateECO(bomB)),eco_file)
     eco_file.close()
     
 
-def split_refdes_list(refs):
-    out = []
+_refdes_range_re = re.compile(r'\s*([A-Z]+)(\d+)\s*-\s*([A-Z]+)(\d+)')
+_refdes_start_re = re.compile(r"\s*([A-Za-z]+)(\d+)")
+# a ref des that can be stored as a number (no leading zeros, nothing after it)
+_refdes_number_re = re.compile(r"([A-Za-z]+)([1-9]\d*|0)$")
+
+# longest range allowed in a ref des list (C1-C1001)
+MAX_REFDES_RANGE = 1000
+
+
+def _parse_refdes_list(refs):
+    """ yield (prefix, first, last) for each entry in a comma separated
+        ref des list, where C1-C8 gives ('C', 1, 8).  Entries that are
+        not a range are yielded as (ref, None, None) """
     for r in refs.split(','):
-        ref = r.strip()
         if r.find('-')>0:
-            m = re.match('\s*([A-Z]+)(\d+)\s*-\s*([A-Z]+)(\d+)',r)
-            if m:
-                try:
-                    r1,n1,r2,n2 = m.groups()
-                    n1 = int(n1)
-                    n2 = int(n2)
-                except ValueError:
-                    raise BadRefDes("ref des %s/%s doesn't have integer sequence number" % (r1,r2))
-                if n2<=n1 or n2-n1>1000 or r1!=r2:
-                    raise BadRefDes("ref des sequence %s-%s is not allowed" % (r1,r2))
-            ref = ['%s%d' % (r1,n) for n in range(n1,n2+1)]
+            m = _refdes_range_re.match(r)
+            if m is None:
+                raise BadRefDes("ref des sequence %s is not allowed" % r.strip())
+            r1,n1,r2,n2 = m.groups()
+            n1 = int(n1)
+            n2 = int(n2)
+            if n2<=n1 or n2-n1>MAX_REFDES_RANGE or r1!=r2:
+                raise BadRefDes("ref des sequence %s-%s is not allowed" % (r1,r2))
+            yield r1,n1,n2
         else:
-            if re.match(r"\s*([A-Za-z]+)(\d+)",r) is None:
+            if _refdes_start_re.match(r) is None:
                 raise BadRefDes("No valid refdes found")
-            ref = [ref]
-        out.extend(ref)
+            yield r.strip(),None,None
+
+
+def split_refdes_list(refs):
+    out = []
+    for ref,first,last in _parse_refdes_list(refs):
+        if first is None:
+            out.append(ref)
+        else:
+            out.extend(['%s%d' % (ref,n) for n in range(first,last+1)])
     return sorted(out)
 
 
-class RefDesList(frozenset):
+def _merge_runs(runs):
+    """ merge sorted (first, last) runs that overlap or touch """
+    out = []
+    for lo,hi in runs:
+        if out and lo<=out[-1][1]+1:
+            if hi>out[-1][1]:
+                out[-1] = (out[-1][0],hi)
+        else:
+            out.append((lo,hi))
+    return out
+
+def _runs_from_numbers(numbers):
+    return _merge_runs([(n,n) for n in sorted(set(numbers))])
+
+def _subtract_runs(a,b):
+    """ return the runs in a that are not in b (both sorted and merged) """
+    out = []
+    k = 0
+    for lo,hi in a:
+        while k<len(b) and b[k][1]<lo:
+            k += 1
+        j = k
+        while j<len(b) and b[j][0]<=hi:
+            if b[j][0]>lo:
+                out.append((lo,b[j][0]-1))
+            lo = max(lo,b[j][1]+1)
+            j += 1
+        if lo<=hi:
+            out.append((lo,hi))
+    return out
+
+def _intersect_runs(a,b):
+    out = []
+    i = j = 0
+    while i<len(a) and j<len(b):
+        lo = max(a[i][0],b[j][0])
+        hi = min(a[i][1],b[j][1])
+        if lo<=hi:
+            out.append((lo,hi))
+        if a[i][1]<b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+class RefDesList(object):
+    """ an immutable set of reference designators.  Designators of the
+        form PREFIX + NUMBER are stored as runs of numbers for each prefix
+        (C1-C1000 is a single run) and any others are kept as strings, so
+        large groups of passives take little memory.
+
+        It can be created from any iterable of ref des (like a frozenset)
+        or, without expanding ranges, from BOM text with from_text().
+        Supports len, in, iteration (sorted), ==, |, & and -.  It is
+        equal to, and hashes like, a set or frozenset of the same ref des.
+        str() gives the compressed text, eg. C1-C10,C12 """
+    __slots__ = ('runs','extra','_len','_hash')
+
+    def __init__(self,refs=()):
+        numbers = {}
+        extra = set()
+        for r in refs:
+            m = _refdes_number_re.match(r)
+            if m is None:
+                extra.add(r)
+            else:
+                numbers.setdefault(m.group(1),[]).append(int(m.group(2)))
+        self._set(dict((prefix,_runs_from_numbers(n)) for prefix,n in numbers.items()),
+                  frozenset(extra))
+
+    def _set(self,runs,extra):
+        # runs = { prefix : [(first, last), ...] } sorted and merged
+        self.runs = dict((prefix,tuple(r)) for prefix,r in runs.items() if r)
+        self.extra = extra
+        self._len = len(extra) + sum([hi-lo+1 for r in self.runs.values() for lo,hi in r])
+        self._hash = None
+
+    @classmethod
+    def _from_runs(cls,runs,extra):
+        self = cls.__new__(cls)
+        self._set(runs,extra)
+        return self
+
+    @classmethod
+    def from_text(cls,refs):
+        """ create from a comma separated list with ranges as found in
+            a BOM, eg. C1-C10,C12.  Raises BadRefDes like split_refdes_list """
+        runs = {}
+        extra = set()
+        for ref,first,last in _parse_refdes_list(refs):
+            if first is None:
+                m = _refdes_number_re.match(ref)
+                if m is None:
+                    extra.add(ref)
+                    continue
+                ref,first = m.group(1),int(m.group(2))
+                last = first
+            runs.setdefault(ref,[]).append((first,last))
+        return cls._from_runs(dict((prefix,_merge_runs(sorted(r))) for prefix,r in runs.items()),
+                              frozenset(extra))
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len>0
+
+    __nonzero__ = __bool__
+
+    def __contains__(self,ref):
+        m = _refdes_number_re.match(ref)
+        if m is None:
+            return ref in self.extra
+        runs = self.runs.get(m.group(1))
+        if runs is None:
+            return False
+        n = int(m.group(2))
+        k = bisect.bisect_right(runs,(n,float('inf')))-1
+        return k>=0 and runs[k][1]>=n
+
+    def __iter__(self):
+        for prefix in sorted(self.runs):
+            for lo,hi in self.runs[prefix]:
+                for n in range(lo,hi+1):
+                    yield '%s%d' % (prefix,n)
+        for r in sorted(self.extra):
+            yield r
+
+    def __eq__(self,other):
+        if isinstance(other,RefDesList):
+            return self.runs==other.runs and self.extra==other.extra
+        if isinstance(other,(set,frozenset)):
+            return len(other)==self._len and all([r in self for r in other])
+        return NotImplemented
+
+    def __hash__(self):
+        # same as a frozenset of the ref des, since they compare equal.
+        # String hashes differ between processes, so it isn't pickled
+        if self._hash is None:
+            self._hash = hash(frozenset(self))
+        return self._hash
+
+    def __reduce__(self):
+        return (RefDesList._from_runs,(self.runs,self.extra))
+
+    def _combine(self,other,func,extra):
+        if not isinstance(other,RefDesList):
+            other = RefDesList(other)
+        runs = {}
+        for prefix in set(self.runs) | set(other.runs):
+            runs[prefix] = func(self.runs.get(prefix,()),other.runs.get(prefix,()))
+        return RefDesList._from_runs(runs,extra(self.extra,other.extra))
+
+    def __or__(self,other):
+        return self._combine(other,lambda a,b:_merge_runs(heapq.merge(a,b)),frozenset.union)
+
+    def __and__(self,other):
+        return self._combine(other,_intersect_runs,frozenset.intersection)
+
+    def __sub__(self,other):
+        return self._combine(other,_subtract_runs,frozenset.difference)
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+
     def __repr__(self):
-        return ','.join(self.sorted())
+        return self.compressed()
 
     def sorted(self,reverse=False):
         """ return list of reference desginators sorted numerically (not ascii order) """
-        #10/26/16 JWP: changed code to split each ref des individually
         r = list(self)
-        for k in range(len(r)):
-            m=re.match(r"([a-zA-Z]+)(\d+)",r[k])
-            if m==None:
-                raise BadRefDes("Ref Des %s doesn't have AAANNN format" % r[k])
-            r[k] = m.groups()
-        r.sort(key=lambda tup:(tup[0],int(tup[1])),reverse=reverse)
-        return ["".join(x) for x in r]
+        if reverse:
+            r.reverse()
+        return r
+
+    def compressed(self):
+        """ return the ref des as text with runs of 3 or more written
+            as a range, eg. C1-C10,C12.  Ranges are split so the text can
+            be read back by split_refdes_list() """
+        out = []
+        for prefix in sorted(self.runs):
+            for lo,hi in self.runs[prefix]:
+                while lo<=hi:
+                    top = min(hi,lo+MAX_REFDES_RANGE)
+                    if top-lo>=2:
+                        out.append('%s%d-%s%d' % (prefix,lo,prefix,top))
+                    else:
+                        out.extend(['%s%d' % (prefix,n) for n in range(lo,top+1)])
+                    lo = top+1
+        out.extend(sorted(self.extra))
+        return ','.join(out)
     
 
 class Part(object):
+    __slots__ = ('manufacturer','partnumber','desc','value','footprint','refs','quant')
+
     def __init__(self,row,keys):
         """ create a part using the dictionary (row read from CSV file) and the mapping keys """
 
@@ -154,8 +462,9 @@ class Part(object):
         self.value = row.get(keys.Value) or row.get(keys.Description) or ""
         if len(self.value)>0:
             self.value = self.value.upper()
+        self.footprint = row.get(keys.Footprint) or ""
         try:
-            self.refs = RefDesList( split_refdes_list( row[keys.RefDes] ) )
+            self.refs = RefDesList.from_text( row[keys.RefDes] )
         except BadRefDes as err:
             err.args = err.args + ("Bad reference designator format for %s/%s/%s/%s" % 
                 (self.manufacturer,self.partnumber,self.desc,row[keys.RefDes]),)
@@ -176,6 +485,12 @@ class Part(object):
             self.value = 'DNI'
             self.partnumber = ''
             self.manufacturer = ''
+
+    @property
+    def mfg_id(self):
+        """ integer id of the manufacturer, see mfg_id().  Not stored, so
+            it follows aliases added after the part was read """
+        return mfg_id(self.manufacturer)
         
 
 class BOMKeys(object):
@@ -189,14 +504,16 @@ class BOMKeys(object):
       self.RefDes - ref des
       self.Qty - quantity
       self.Fitted - 'Fitted' or '' means installed, 'Not Fitted' means DNP
+      self.found - set of the attribute names above whose column is in the file
       """
     
     def __init__(self,row):
-        for k,words in BOM_column_headings.iteritems():
-            w_list = [x.upper() for x in words]
+        self.found = set()
+        for k,aliases in BOM_heading_aliases.items():
             for ndx in row:
-                if ndx.upper() in w_list:
+                if ndx.strip().upper() in aliases:
                     setattr(self,k,ndx)
+                    self.found.add(k)
                     break
             else:
                 setattr(self,k,k)
@@ -208,56 +525,98 @@ class BOMReader(object):
             Part Number, Manufacturer, RefDes, and Quantity header labels.  Lines before this
             header will be ignored.
 
+            The delimiter (comma, tab or semicolon) is found from the header row unless it is
+            given.  Parts are read from the file one at a time as the reader is iterated, so
+            iterating a BOMReader directly is the way to go through a huge BOM with bounded
+            memory.  BOM keeps every part.
+
             Otherwise this class works much like a DictReader()
             
             """
-    def __init__(self,csvfile,**kwds):
+    def __init__(self,csvfile,delimiter=None,**kwds):
         self.line_num = 0
-        headers = self._find_header_row(csvfile)
-        self.csv = csv.DictReader(csvfile,fieldnames=headers,**kwds)
+        headers,self.delimiter = self._find_header_row(csvfile,delimiter)
+        self.fieldnames = headers
+        self.csv = csv.reader(csvfile,delimiter=self.delimiter,**kwds)
         self.keys = BOMKeys( headers )
 
-    def _is_heading_found_in_row(self,h,row):
-        for alias in BOM_column_headings[h]:
-            if alias in row:
-                return True
-        return False
+    def _is_header_row(self,row):
+        cells = set([x.strip().upper() for x in row])
+        for h in BOM_required_columns:
+            if cells.isdisjoint(BOM_heading_aliases[h]):
+                return False
+        return True
 
-    def _find_header_row(self,fi):
-        required_columns = ['PartNumber','Manufacturer','RefDes','Qty']
-        for row in csv.reader(fi):
+    def _find_header_row(self,fi,delimiter=None):
+        delimiters = BOM_delimiters if delimiter is None else (delimiter,)
+        for line in fi:
             self.line_num += 1
-            if all([self._is_heading_found_in_row(h,row) for h in required_columns]):
-                return row
+            for d in delimiters:
+                if d in line:
+                    row = next(csv.reader([line],delimiter=d))
+                    if self._is_header_row(row):
+                        return row,d
         raise Exception("Unable to locate BOM header row")
 
     def __iter__(self):
         return self
     
-    def next(self):
+    def __next__(self):
+        n = len(self.fieldnames)
         while True:
+            row = next(self.csv)
+            self.line_num += 1
+            if not any(row):
+                continue
+            if len(row)<n:
+                row = row + ['']*(n-len(row))
             try:
-                self.line_num += 1
-                return Part( self.csv.next(), self.keys )
+                return Part( dict(zip(self.fieldnames,row)), self.keys )
             except BadRefDes as err:
                 eprint( "Ignoring line %d due to invalid format: %s" % (self.line_num,err.args))
 
+    next = __next__
+
 class BOM(object):
-    def __init__(self,fi):
-        """ create a BOM from a .CSV file object 
-            each part number must occur only once.  """
-        self.parts = list(BOMReader(fi))
-        #check for duplicate parts
-        sorted_list = sorted(self.parts, key=lambda a:a.partnumber)
-        for k in range(len(sorted_list)-1):
-            if sorted_list[k].partnumber != '' and (sorted_list[k].partnumber == sorted_list[k+1].partnumber):
-                eprint("Warning:  BOM contains duplicate part number: %s" % sorted_list[k].partnumber)
+    def __init__(self,fi,delimiter=None):
+        """ create a BOM from a .CSV (or tab or semicolon delimited) file object 
+            each part number must occur only once.  has_values is False if
+            the file has no Value column (values are then descriptions).
+            Every Part is kept in self.parts, so memory grows with the size
+            of the BOM.  Comparisons and ECOs need all the parts of both
+            BOMs; use a BOMReader to go through a BOM one part at a time """
+        self.parts = []
+        self._indexes = {} # { attribute : { value : first part with that value } }
+        seen = set()
+        reader = BOMReader(fi,delimiter=delimiter)
+        self.has_values = 'Value' in reader.keys.found
+        for p in reader:
+            #check for duplicate parts
+            if p.partnumber != '':
+                if p.partnumber in seen:
+                    eprint("Warning:  BOM contains duplicate part number: %s" % p.partnumber)
+                seen.add(p.partnumber)
+            self.parts.append(p)
 
     def findPart(self,attribute,value):
-        for p in self.parts:
-            if getattr(p,attribute)==value:
-                return p
-        raise ValueError
+        """ return the first part whose attribute (partnumber, manufacturer,
+            value, ...) equals value, or raise ValueError.  The index for
+            each attribute is built on first use, call reindex() after
+            changing self.parts or the parts in it """
+        index = self._indexes.get(attribute)
+        if index is None:
+            index = {}
+            for p in self.parts:
+                index.setdefault(getattr(p,attribute),p)
+            self._indexes[attribute] = index
+        try:
+            return index[value]
+        except KeyError:
+            raise ValueError("No part with %s %s" % (attribute,value))
+
+    def reindex(self):
+        """ drop the findPart() indexes so they are rebuilt """
+        self._indexes = {}
         
     def compare(self,newBom):
         """ Compare self to a new BOM object, printing out differences """
@@ -288,108 +647,501 @@ class BOM(object):
         d = {}
         for p in self.parts:
             for r in p.refs:
-                if d.has_key(r):
+                if r in d:
                     raise Exception("Duplicate reference designator %s (P/Ns %s and %s)" %
                                     (r,p.partnumber, d[r].partnumber))
                 d[r] = p
         return d
     
+    def crossCheck(self,netlist):
+        """ check the BOM against the components and nets of a netlist
+            loaded by kipy.netlist_utils (KicadNetlist, PadsNetlist).
+            Returns a dict with
+                'bom_only':      ref des in the BOM but not the netlist
+                'netlist_only':  ref des in the netlist but not the BOM
+                'mismatches':    list of dicts { 'ref', 'field' ('footprint'
+                                 or 'value'), 'bom', 'netlist' }
+                'dni_connected': list of dicts { 'ref', 'pins' } for DNI
+                                 parts with pins on nets with other nodes
+            Footprints and values are only compared when both sides have
+            one.  Footprints ignore case and any library prefix
+            (lib:footprint), values are compared with
+            value_utils.values_equal() and only if the BOM has a Value
+            column. """
+        bom_refs = self.listByRefDes()
+        comps = {}
+        if netlist.list_of_comps is not None and netlist.list_of_comps.components:
+            for c in netlist.list_of_comps.components:
+                comps[c.ref] = c
+        res = {'bom_only': [], 'netlist_only': [], 'mismatches': [], 'dni_connected': []}
+        dni = set()
+        for ref,part in bom_refs.items():
+            comp = comps.get(ref)
+            if comp is None:
+                res['bom_only'].append(ref)
+                continue
+            if part.value=='DNI':
+                dni.add(ref)
+            elif self.has_values:
+                bom_value = part.value
+                nl_value = getattr(comp,'value',None)
+                if bom_value and nl_value and not value_utils.values_equal(bom_value,nl_value):
+                    res['mismatches'].append({'ref': ref, 'field': 'value',
+                                              'bom': bom_value, 'netlist': nl_value})
+            bom_fp = part.footprint.split(':')[-1].upper()
+            nl_fp = (getattr(comp,'footprint',None) or '').split(':')[-1].upper()
+            if bom_fp and nl_fp and bom_fp!=nl_fp:
+                res['mismatches'].append({'ref': ref, 'field': 'footprint',
+                                          'bom': part.footprint, 'netlist': comp.footprint})
+        for ref in comps:
+            if ref not in bom_refs:
+                res['netlist_only'].append(ref)
+
+        if dni:
+            connected = {}
+            for net in netlist.list_of_nets.nets:
+                if len(net.nodes)<2:
+                    continue
+                for node in net.nodes:
+                    if node.ref in dni:
+                        connected.setdefault(node.ref,[]).append("{}.{}".format(node.ref,node.pin))
+            for ref in RefDesList(connected).sorted():
+                res['dni_connected'].append({'ref': ref, 'pins': sorted(connected[ref])})
+        res['bom_only'] = RefDesList(res['bom_only']).sorted()
+        res['netlist_only'] = RefDesList(res['netlist_only']).sorted()
+        res['mismatches'].sort(key=lambda m:(_refdes_key(m['ref']),m['field']))
+        return res
+
     def calculateECO(self,newBom):
         """ generate a list of changes to go from SELF to NewBOM """
         oldlist = self.listByRefDes()
         newlist = newBom.listByRefDes()
 
         difflist = []
-        for ref,oldpart in oldlist.iteritems():
+        for ref,oldpart in oldlist.items():
             try:
                 newpart = newlist[ref]
             except KeyError:
                 difflist.append( ('remove',ref,oldpart) )
                 continue                
-            if (newpart.partnumber!=oldpart.partnumber or
-                not compare_mfg(newpart.manufacturer,oldpart.manufacturer) or
-                newpart.value != oldpart.value):
+            if parts_differ(oldpart,newpart):
                 difflist.append( ('change',ref,oldpart,newpart) )
             del newlist[ref]
 
-        for ref,newpart in newlist.iteritems():
+        for ref,newpart in newlist.items():
             difflist.append( ('add',ref,newpart) )
 
         return difflist
                              
-    def showECO(self,newBom, valuechg=False,outfile=None):
+    def showECO(self,newBom, valuechg=False,outfile=None,group=False,fmt='csv'):
+        """ write the ECO to go from SELF to newBom to outfile (stdout by
+            default) as it is generated, see iter_eco_rows() and write_eco() """
         if outfile is None:
             outfile = sys.stdout
-        lst = self.ECOtoList(newBom,valuechg)
-        fo = csv.writer(outfile)
-        for txt in lst:
-            fo.writerow( txt )
+        write_eco(iter_eco_rows(self.calculateECO(newBom),valuechg,group),outfile,fmt)
             
     def ECOtoList(self,newBom, valuechg=False):
-        def sort_part_list(part_list,k):
-            # part_list is a list of tuples
-            # k is which tuple index has the part (.value/.partnumber/.manufacturer) 
-            s = sorted(part_list, cmp=lambda x,y:cmp(x[k].value,y[k].value))
-            s.sort(cmp=lambda x,y:cmp(x[k].partnumber,y[k].partnumber))
-            s.sort(cmp=lambda x,y:cmp(x[k].manufacturer,y[k].manufacturer))
-            return s
-
-        def fix_dni(part_list,k):
-            for p in part_list:
-                if p[k].value.upper()=='DNI':
-                    p[k].manufacturer=''
-                    p[k].partnumber=''
-
-        eco = self.calculateECO(newBom)
-
-        remove_list = filter(lambda x:x[0]=='remove',eco)
-        add_list = filter(lambda x:x[0]=='add',eco)
-        change_list = filter(lambda x:x[0]=='change',eco)
-        lst = ["action,ref,old manufacturer,old part number,old value,,new manufacturer,new part number,new value".split(',')]
-
-        remove_list = sort_part_list(remove_list,2)
-        for change,ref,oldpart in remove_list:
-            s =  ['remove', ref,oldpart.manufacturer,oldpart.partnumber,oldpart.value]
-            lst.append(s)
-
-        change_list = sort_part_list(change_list,3)
-        for change,ref,oldpart,newpart in change_list:
-            if oldpart.partnumber==newpart.partnumber:
-                if not compare_mfg(oldpart.manufacturer,newpart.manufacturer):
-                    s = ["mfgchg",
-                         ref,
-                         oldpart.manufacturer,oldpart.partnumber,oldpart.value,
-                         "now",
-                         newpart.manufacturer,newpart.partnumber,newpart.value]
-                    lst.append(s)
-                else:
-                    if valuechg:
-                        s = ["valuechg",
-                             ref,
-                             oldpart.manufacturer,oldpart.partnumber,oldpart.value,
-                             "now",
-                             newpart.manufacturer,newpart.partnumber,newpart.value]
-                        lst.append(s)
-            else:
-                s = ["pnchg",
-                     ref,
-                     oldpart.manufacturer,oldpart.partnumber,oldpart.value,
-                     "now",
-                     newpart.manufacturer,newpart.partnumber,newpart.value]
-                lst.append(s)
-
-        add_list = sort_part_list(add_list,2)
-        
-        for add,ref,newpart in add_list:
-            s = ["add",
-                 ref,
-                 "","","","now",
-                 newpart.manufacturer,newpart.partnumber,newpart.value]
-            lst.append(s)
-            #print(s)
+        """ return the ECO to go from SELF to newBom as a list of rows,
+            starting with the header row """
+        lst = [list(ECO_HEADER)]
+        lst.extend(iter_eco_rows(self.calculateECO(newBom),valuechg))
         return lst
 
 
+ECO_HEADER = ("action,ref,old manufacturer,old part number,old value,,"
+              "new manufacturer,new part number,new value").split(',')
+
+# keys used for the columns of ECO_HEADER by write_eco(fmt='jsonl')
+ECO_JSON_KEYS = ['action','ref','old_manufacturer','old_partnumber','old_value',None,
+                 'new_manufacturer','new_partnumber','new_value']
+
+# order of the sections in an ECO
+_eco_sections = {'remove': 0, 'change': 1, 'add': 2}
+
+def _part_key(part):
+    return (part.manufacturer,part.partnumber,part.value)
+
+def _refdes_key(ref):
+    m = _refdes_number_re.match(ref)
+    if m is None:
+        return (ref,-1)
+    return (m.group(1),int(m.group(2)))
+
+def _eco_change_action(oldpart,newpart,valuechg):
+    if oldpart.partnumber!=newpart.partnumber:
+        return 'pnchg'
+    if oldpart.mfg_id!=newpart.mfg_id:
+        return 'mfgchg'
+    if valuechg:
+        return 'valuechg'
+    return None
+
+def iter_eco_rows(eco,valuechg=False,group=False):
+    """
+    yield the rows of an ECO (without the header, see ECO_HEADER): the
+    removed parts, then the changed parts and then the added parts, each
+    section sorted by manufacturer, part number, value and ref des.
+    :Args:
+        :eco (list): ECO as returned by BOM.calculateECO()
+        :valuechg (bool): include value changes on the same part number
+        :group (bool): if True, ref des that have the same change are
+                       listed in one row with ranges, eg. C1-C10,C12
+    """
+    entries = []
+    for item in eco:
+        action,ref = item[0],item[1]
+        if action=='remove':
+            old = item[2]
+            key = (0,) + _part_key(old)
+            row = ['remove',ref,old.manufacturer,old.partnumber,old.value]
+        elif action=='add':
+            new = item[2]
+            key = (2,) + _part_key(new)
+            row = ['add',ref,'','','','now',new.manufacturer,new.partnumber,new.value]
+        else:
+            old,new = item[2],item[3]
+            action = _eco_change_action(old,new,valuechg)
+            if action is None:
+                continue
+            key = (1,) + _part_key(new) + _part_key(old)
+            row = [action,ref,old.manufacturer,old.partnumber,old.value,
+                   'now',new.manufacturer,new.partnumber,new.value]
+        entries.append((key,_refdes_key(ref),row))
+    entries.sort(key=lambda e:(e[0],e[1]))
+
+    if not group:
+        for key,refkey,row in entries:
+            yield row
+        return
+    k = 0
+    while k<len(entries):
+        key,refkey,row = entries[k]
+        refs = [row[1]]
+        k += 1
+        while k<len(entries) and entries[k][0]==key:
+            refs.append(entries[k][2][1])
+            k += 1
+        if len(refs)>1:
+            row = list(row)
+            row[1] = RefDesList(refs).compressed()
+        yield row
+
+def write_eco(rows,outfile,fmt='csv'):
+    """
+    write ECO rows from iter_eco_rows() to outfile as they are generated
+    and return the number of rows written (without the header)
+    :Args:
+        :fmt (str): 'csv' (with the ECO_HEADER row) or 'jsonl' (a JSON
+                    object per line with the ECO_JSON_KEYS keys)
+    """
+    n = 0
+    if fmt=='csv':
+        fo = csv.writer(outfile)
+        fo.writerow(ECO_HEADER)
+        for row in rows:
+            fo.writerow(row)
+            n += 1
+    elif fmt=='jsonl':
+        for row in rows:
+            d = dict([(k,v) for k,v in zip(ECO_JSON_KEYS,row) if k is not None])
+            outfile.write(json.dumps(d) + '\n')
+            n += 1
+    else:
+        raise ValueError("Unknown ECO format '%s'" % fmt)
+    return n
+
+
+class VariantMatrix(object):
+    """ Part assignments of every ref des in several BOMs (eg. the
+        assembly variants of one design), indexed once by ref des:
+            self.names = list of variant names
+            self.parts = dict { ref des : [Part or None for each variant] }
+        Building it is linear in the total number of ref des.  ECOs
+        between any two variants are read from it without building
+        new lists of parts. """
+    def __init__(self,boms,names=None):
+        if names is None:
+            names = ['BOM%d' % (k+1) for k in range(len(boms))]
+        if len(names)!=len(boms):
+            raise ValueError("Need one name for each BOM")
+        self.names = list(names)
+        self.parts = {}
+        n = len(boms)
+        for k,bom in enumerate(boms):
+            for p in bom.parts:
+                for r in p.refs:
+                    row = self.parts.get(r)
+                    if row is None:
+                        row = self.parts[r] = [None]*n
+                    elif row[k] is not None:
+                        raise Exception("Duplicate reference designator %s in %s (P/Ns %s and %s)" %
+                                        (r,self.names[k],p.partnumber,row[k].partnumber))
+                    row[k] = p
+
+    def _column(self,variant):
+        if isinstance(variant,int):
+            return variant
+        return self.names.index(variant)
+
+    def refs(self):
+        """ return the ref des in all variants sorted numerically """
+        return RefDesList(self.parts).sorted()
+
+    def differing_refs(self):
+        """ return the ref des that are not the same part in every variant """
+        res = []
+        for ref in self.refs():
+            row = self.parts[ref]
+            first = row[0]
+            for p in row[1:]:
+                if (first is None) != (p is None) or (p is not None and parts_differ(first,p)):
+                    res.append(ref)
+                    break
+        return res
+
+    def rows(self,only_differences=False):
+        """ yield a header row and then a row for each ref des with the
+            part number of each variant ('DNI' for unfitted parts and
+            '' if the ref des isn't in that variant) """
+        yield ['RefDes'] + self.names
+        refs = self.differing_refs() if only_differences else self.refs()
+        for ref in refs:
+            row = [ref]
+            for p in self.parts[ref]:
+                if p is None:
+                    row.append('')
+                elif p.value=='DNI':
+                    row.append('DNI')
+                else:
+                    row.append(p.partnumber)
+            yield row
+
+    def write_csv(self,outfile,only_differences=False):
+        fo = csv.writer(outfile)
+        for row in self.rows(only_differences):
+            fo.writerow(row)
+
+    def calculateECO(self,old,new):
+        """ generate a list of changes to go from variant old to variant new
+            (names or column numbers) in the format of BOM.calculateECO """
+        a = self._column(old)
+        b = self._column(new)
+        difflist = []
+        for ref,row in self.parts.items():
+            oldpart = row[a]
+            newpart = row[b]
+            if oldpart is None:
+                if newpart is not None:
+                    difflist.append( ('add',ref,newpart) )
+            elif newpart is None:
+                difflist.append( ('remove',ref,oldpart) )
+            elif parts_differ(oldpart,newpart):
+                difflist.append( ('change',ref,oldpart,newpart) )
+        return difflist
+
+    def pairwise_ECOs(self):
+        """ return a dict { (old name, new name) : ECO list } for each
+            pair of variants """
+        res = {}
+        for a in range(len(self.names)):
+            for b in range(len(self.names)):
+                if a!=b:
+                    res[(self.names[a],self.names[b])] = self.calculateECO(a,b)
+        return res
+
+
+class BOMTree(object):
+    """ BOMs of an assembly and its sub-assemblies.  A part in one BOM
+        whose part number is the name of another BOM is a sub-assembly
+        and is exploded into that BOM's parts:
+            self.boms = dict { assembly part number : BOM }
+        explode() passes the number of each assembly to build down to its
+        sub-assemblies in topological order, so every BOM line is visited
+        once however deep the tree is or how often a sub-assembly is
+        reused. """
+    def __init__(self,boms):
+        self.boms = dict((pn.upper(),bom) for pn,bom in boms.items())
+        self._lines = {}
+
+    @classmethod
+    def from_files(cls,files):
+        """ create from BOM file names, using each file name without its
+            extension as the part number of the assembly """
+        boms = {}
+        for f in files:
+            with open(f) as fi:
+                boms[os.path.splitext(os.path.basename(f))[0]] = BOM(fi)
+        return cls(boms)
+
+    def _assembly_lines(self,assembly):
+        """ return ([(sub-assembly, qty)], [((manufacturer, part number), qty)])
+            for one assembly, leaving out DNI parts """
+        lines = self._lines.get(assembly)
+        if lines is None:
+            subs = []
+            parts = {}
+            for p in self.boms[assembly].parts:
+                if p.partnumber in self.boms:
+                    subs.append((p.partnumber,p.quant))
+                elif p.partnumber!='':
+                    key = (canonical_mfg(p.manufacturer),p.partnumber)
+                    parts[key] = parts.get(key,0) + p.quant
+            lines = self._lines[assembly] = (subs,list(parts.items()))
+        return lines
+
+    def build_order(self,assemblies):
+        """ return the assemblies and all their sub-assemblies with each
+            one before its sub-assemblies.  Raises BOMCycle if an assembly
+            contains itself """
+        done = set()
+        postorder = []
+        for top in assemblies:
+            if top in done:
+                continue
+            if top not in self.boms:
+                raise KeyError("No BOM for assembly %s" % top)
+            # depth first without recursion, children finish before parents
+            path = [top]
+            on_path = set(path)
+            stack = [iter(self._assembly_lines(top)[0])]
+            while stack:
+                child = next(stack[-1],None)
+                if child is None:
+                    stack.pop()
+                    done.add(path[-1])
+                    postorder.append(path[-1])
+                    on_path.discard(path.pop())
+                    continue
+                child = child[0]
+                if child in on_path:
+                    cycle = path[path.index(child):] + [child]
+                    raise BOMCycle("BOM contains itself: %s" % ' -> '.join(cycle))
+                if child not in done:
+                    path.append(child)
+                    on_path.add(child)
+                    stack.append(iter(self._assembly_lines(child)[0]))
+        postorder.reverse()
+        return postorder
+
+    def explode(self,builds):
+        """ return dict { (manufacturer, part number) : quantity } of the
+            purchased parts for builds, a dict { assembly part number :
+            number to build } or a single assembly part number to build
+            one of.  Manufacturers are in canonical form (see
+            canonical_mfg()) and DNI parts are left out.  Raises BOMCycle
+            if an assembly contains itself """
+        if isinstance(builds,str):
+            builds = {builds: 1}
+        demand = {}
+        for assembly,n in builds.items():
+            assembly = assembly.upper()
+            demand[assembly] = demand.get(assembly,0) + n
+        total = {}
+        for assembly in self.build_order(list(demand)):
+            n = demand[assembly]
+            subs,parts = self._assembly_lines(assembly)
+            for sub,q in subs:
+                demand[sub] = demand.get(sub,0) + n*q
+            for key,q in parts:
+                total[key] = total.get(key,0) + n*q
+        return total
+
+    def write_csv(self,outfile,builds):
+        """ write the explode() list to outfile as CSV sorted by
+            manufacturer and part number """
+        fo = csv.writer(outfile)
+        fo.writerow(['Manufacturer','Part Number','Qty'])
+        for (mfg,pn),n in sorted(self.explode(builds).items()):
+            fo.writerow([mfg,pn,n])
+
+
+def read_bom_manifest(fi):
+    """ return a list of (old BOM, new BOM, ECO file) from a CSV manifest
+        with one comparison per row.  Blank rows, rows starting with # and
+        an OLD,NEW,ECO header row are skipped.  Relative paths are taken
+        from the directory of the manifest when fi is a file name. """
+    if isinstance(fi,str):
+        base = os.path.dirname(fi)
+        with open(fi) as f:
+            return [tuple(os.path.join(base,name) for name in job) for job in read_bom_manifest(f)]
+    jobs = []
+    for row in csv.reader(fi):
+        row = [c.strip() for c in row]
+        if not any(row) or row[0].startswith('#') or row[0].upper()=='OLD':
+            continue
+        if len(row)<3:
+            raise ValueError("manifest row needs OLD,NEW,ECO file names: %s" % ','.join(row))
+        jobs.append(tuple(row[:3]))
+    return jobs
+
+def _run_bom_job(job):
+    """ load, compare and write the ECO for one manifest row.  Errors are
+        returned in the result so that one bad BOM doesn't stop a batch """
+    (old,new,eco_out),valuechg,group,fmt,aliases = job
+    res = {'old': old, 'new': new, 'eco': eco_out, 'status': 'ok', 'changes': 0}
+    t0 = time.perf_counter()
+    try:
+        if any(mfg_aliases.get(k)!=v for k,v in aliases.items()):
+            add_mfg_aliases(aliases)
+        with open(old) as fi:
+            bomA = BOM(fi)
+        with open(new) as fi:
+            bomB = BOM(fi)
+        with open(eco_out,'w',newline='') as fo:
+            res['changes'] = write_eco(iter_eco_rows(bomA.calculateECO(bomB),valuechg,group),fo,fmt)
+    except Exception as err:
+        res['status'] = 'error'
+        res['error'] = "%s: %s" % (type(err).__name__,err)
+    res['seconds'] = time.perf_counter() - t0
+    return res
+
+def run_bom_batch(jobs,valuechg=False,group=False,fmt='csv',workers=None,parallel=True):
+    """ compare many BOM pairs and write their ECOs
+    :Args:
+        :jobs (list or str): (old BOM, new BOM, ECO file) tuples, or the
+                             name of a manifest file (see read_bom_manifest)
+        :workers (int): number of processes, os.cpu_count() by default
+        :parallel (bool): if False (or processes can't be started) the
+                          pairs are compared one after the other.  Jobs
+                          that were lost when a worker process died are
+                          run again in this process
+    :Returns:
+        dict { 'results': a dict per job in the order given with keys old,
+                          new, eco, status ('ok' or 'error'), changes
+                          (ECO rows written), seconds and error (failed
+                          jobs only),
+               'totals':  { jobs, ok, failed, changes, seconds (wall
+                          time), job_seconds (sum over jobs) } }
+    """
+    if isinstance(jobs,str):
+        jobs = read_bom_manifest(jobs)
+    # workers don't see aliases added at run time unless they are forked
+    aliases = dict(mfg_aliases)
+    work = [(job,valuechg,group,fmt,aliases) for job in jobs]
+    t0 = time.perf_counter()
+    results = [None]*len(work)
+    if parallel and len(work)>1:
+        futures = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_bom_job,w) for w in work]
+                wait(futures)
+        except (OSError,NotImplementedError,BrokenProcessPool):
+            pass
+        for k,f in enumerate(futures):
+            if f.done() and not f.cancelled() and f.exception() is None:
+                results[k] = f.result()
+    results = [r if r is not None else _run_bom_job(w) for r,w in zip(results,work)]
+    failed = sum(1 for r in results if r['status']!='ok')
+    totals = {'jobs': len(results),
+              'ok': len(results) - failed,
+              'failed': failed,
+              'changes': sum(r['changes'] for r in results),
+              'seconds': time.perf_counter() - t0,
+              'job_seconds': sum(r['seconds'] for r in results)}
+    return {'results': results, 'totals': totals}
+
+
 if __name__=='__main__':
 
     from optparse import OptionParser
@@ -401,11 +1153,77 @@ if __name__=='__main__':
 
     parser.add_option("--eco", dest="eco", default=None,
                       help="Store ECO to CSV format file")
+    parser.add_option("--group", dest="group", default=False, action="store_true",
+                      help="List ref des with the same change on one line in the ECO (C1-C10,C12)")
+    parser.add_option("--jsonl", dest="jsonl", default=False, action="store_true",
+                      help="Store the ECO as JSON lines instead of CSV")
+    parser.add_option("--netlist", dest="netlist", default=None,
+                      help="Cross check a BOM against a KiCad (.net) or PADS (.NET/.asc) netlist")
+    parser.add_option("--aliases", dest="aliases", default=None,
+                      help="CSV file of ALIAS,MANUFACTURER names to treat as the same manufacturer")
+    parser.add_option("--matrix", dest="matrix", default=None,
+                      help="Store comparison of 2 or more BOM variants to CSV format file")
+    parser.add_option("--diffonly", dest="diffonly", default=False, action="store_true",
+                      help="Only list ref des that differ in the --matrix file")
+    parser.add_option("--explode", dest="explode", default=None,
+                      help="Store total part quantities to build the first BOM, with the other BOMs as sub-assemblies, to CSV format file")
+    parser.add_option("--batch", dest="batch", default=None,
+                      help="Write the ECO for each OLD,NEW,ECO row of a CSV manifest file")
+    parser.add_option("--workers", dest="workers", default=None, type="int",
+                      help="Number of processes used by --batch (default: one per CPU)")
     
     (options,args) = parser.parse_args()
 
+    if options.aliases:
+        load_mfg_aliases(options.aliases)
 
-    if options.compare or options.eco:
+    if options.batch:
+        res = run_bom_batch(options.batch,group=options.group,
+                            fmt='jsonl' if options.jsonl else 'csv',
+                            workers=options.workers)
+        for r in res['results']:
+            if r['status']!='ok':
+                print("FAILED %s -> %s: %s" % (r['old'],r['new'],r['error']))
+        t = res['totals']
+        print("%d of %d comparisons written, %d failed, %d changes in %.2f s (%.2f s of work)" %
+              (t['ok'],t['jobs'],t['failed'],t['changes'],t['seconds'],t['job_seconds']))
+        if t['failed']:
+            sys.exit(1)
+    elif options.explode:
+        if len(args)<1:
+            print("Must specify the top level BOM")
+        else:
+            tree = BOMTree.from_files(args)
+            with open(options.explode,'w',newline='') as fo:
+                tree.write_csv(fo,os.path.splitext(os.path.basename(args[0]))[0])
+    elif options.netlist:
+        if len(args)!=1:
+            print("Must specify a BOM")
+        else:
+            try:
+                from . import netlist_utils
+            except ImportError:     # run as a script
+                import netlist_utils
+            if options.netlist.endswith('.net'):
+                nl = netlist_utils.KicadNetlist(options.netlist)
+            else:
+                nl = netlist_utils.PadsNetlist(options.netlist)
+            res = BOM(open(args[0])).crossCheck(nl)
+            print("In BOM but not netlist: %s" % RefDesList(res['bom_only']))
+            print("In netlist but not BOM: %s" % RefDesList(res['netlist_only']))
+            for m in res['mismatches']:
+                print("%s: %s is %s in BOM and %s in netlist" % (m['ref'],m['field'],m['bom'],m['netlist']))
+            for d in res['dni_connected']:
+                print("%s: DNI part with connected pins %s" % (d['ref'],' '.join(d['pins'])))
+    elif options.matrix:
+        if len(args)<2:
+            print("Must specify 2 or more BOMs")
+        else:
+            boms = [BOM(open(f)) for f in args]
+            names = [os.path.splitext(os.path.basename(f))[0] for f in args]
+            with open(options.matrix,'w',newline='') as fo:
+                VariantMatrix(boms,names).write_csv(fo,only_differences=options.diffonly)
+    elif options.compare or options.eco:
         if len(args)!=2:
             print("Must specify OLD and NEW BOMs")
         else:
@@ -415,6 +1233,8 @@ if __name__=='__main__':
             if options.compare:
                 old.compare(new)
             if options.eco:
-                old.showECO(new,outfile=open(options.eco,'wb'))
+                with open(options.eco,'w',newline='') as fo:
+                    old.showECO(new,outfile=fo,group=options.group,
+                                fmt='jsonl' if options.jsonl else 'csv')
                 
                                
@@ -17,12 +17,39 @@ netlist_utils.py
         >>> from kipy import netlist_utils
         >>> netlist_utils.diff_netlist_file("old_netlist.NET", "new_netlist.NET", diff_file="diff.txt")
 
+    :Usage to time the phases of a diff:
+        >>> from kipy.stats import Stats
+        >>> st = Stats()
+        >>> netlist_utils.diff_netlist_files("old_netlist.NET", "new_netlist.NET", stats=st)
+        >>> print(st.report())
+
+    :Usage to write a draft BOM (one line per value and footprint):
+        >>> nl1.save_bom("draft_bom.csv")
+        >>> from kipy import compare_boms
+        >>> bom = compare_boms.BOM(open("draft_bom.csv"))
+
+    :Usage to run the check_nets checks without parsing the files again:
+        >>> from kipy import check_nets
+        >>> old = check_nets.NetList.from_netlist(nl1)
+        >>> new = check_nets.NetList.from_netlist(nl2)
+        >>> old.compareNetList(new)
+
 
 """
 import re
+import csv
 import sexpdata
 import operator
 
+try:
+    from .stats import get_stats
+    from . import value_utils
+    from .compare_boms import RefDesList
+except ImportError:     # run as a script
+    from stats import get_stats
+    import value_utils
+    from compare_boms import RefDesList
+
 IGNORE_PINS = [
                 '1',
                 '2',
@@ -102,9 +129,11 @@ class Netlist(object):
                         :footprint (str):
         ...
         Optionally, this object can also have other type-specific properties
+        :stats (Stats()): timings and counters for loading (see kipy.stats)
     """
-    def __init__(self, in_file):
+    def __init__(self, in_file, stats=None):
         self.in_file = in_file
+        self.stats = get_stats(stats)
 
     def load_netlist(self, in_file):
         """
@@ -147,6 +176,64 @@ class Netlist(object):
         
         return ret 
 
+    def get_bom(self, keep_lib=False):
+        """
+        group the components by value and footprint in one pass. Values
+        that are written differently but are the same (1UF, 1.0uF) are
+        one group, see value_utils.value_key()
+        :Args:
+            :keep_lib (bool): If True, keep the library reference in the
+                              footprint
+        :Returns:
+            list of dicts {'refs': RefDesList(), 'qty': <int>,
+                           'value': <value of the first part in the group>,
+                           'footprint': <footprint>}
+            in alpha-numeric order of the first ref des of each group
+        """
+        groups = {}
+        value_key = value_utils.value_key
+        for comp in self.list_of_comps.components:
+            value = getattr(comp, 'value', None)
+            if value is None:
+                value = ""
+            footprint = comp.footprint or ""
+            if not keep_lib:
+                footprint = footprint.split(":")[-1]
+            key = (value_key(value), footprint)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = group = (value, footprint, [])
+            group[2].append(comp.ref)
+        lines = {}
+        for value, footprint, refs in groups.values():
+            refs = RefDesList(refs)
+            lines[next(iter(refs))] = {
+                                       'refs':      refs,
+                                       'qty':       len(refs),
+                                       'value':     value,
+                                       'footprint': footprint,
+                                       }
+        return [lines[ref] for ref in sort_alpha_num(lines.keys())]
+
+    def save_bom(self, out_file, keep_lib=False):
+        """
+        write the components as a BOM CSV file that compare_boms.BOM
+        can read, with compressed ref des (C1-C10,C12). Manufacturer
+        and part number are left blank
+        :Args:
+            :out_file (str or file): file name or open file to write to
+            :keep_lib (bool): see get_bom()
+        """
+        if isinstance(out_file, str):
+            with open(out_file, "w", newline="") as fo:
+                return self.save_bom(fo, keep_lib=keep_lib)
+        writer = csv.writer(out_file)
+        writer.writerow(['Designator', 'Manufacturer', 'Part Number', 'Description',
+                         'Value', 'Footprint', 'Qty'])
+        for line in self.get_bom(keep_lib=keep_lib):
+            writer.writerow([line['refs'].compressed(), '', '', '',
+                             line['value'], line['footprint'], line['qty']])
+
     def save_pads_netlist(self, out_file=None, separate_files=False):
         """
         Save this object as a PADS netlist. If separate_file is True,
@@ -240,6 +327,24 @@ class ListOfNetsObj(object):
         """
         raise NotImplementedError("Cannot instantiate base class")
 
+    def get_node_sets(self):
+        """
+        return a dict for the netlist with the following format
+        :keys:      net names (as in get_dict())
+        :values:    set of nodes
+                    :nodes: (str) as <REF>.<PIN NUMBER>
+        The dict is built on the first call and the same dict (and sets)
+        is returned afterwards, so it must not be modified. It is shared
+        with check_nets.NetList.from_netlist()
+        """
+        node_sets = getattr(self, '_node_sets', None)
+        if node_sets is None:
+            node_sets = {}
+            for net, nodes in self.get_dict().items():
+                node_sets[net] = set(nodes)
+            self._node_sets = node_sets
+        return node_sets
+
     def get_nodes(self):
         """
         return a list of all of the nodes
@@ -374,6 +479,17 @@ class Component(object):
         """
         raise NotImplementedError("Cannot instantiate base class")
 
+    @property
+    def parsed_value(self):
+        """
+        the value as a value_utils.EngValue (None if it isn't a resistor,
+        capacitor or inductor value or there is no value)
+        """
+        value = getattr(self, 'value', None)
+        if value is None:
+            return None
+        return value_utils.parse_value(value)
+
 ######################################################################
 #       END OF BASE CLASSES
 ######################################################################
@@ -384,16 +500,18 @@ class Component(object):
 
 class KicadNetlist(Netlist):
 
-    def __init__(self, in_file):
-        super(KicadNetlist, self).__init__(in_file)
+    def __init__(self, in_file, stats=None):
+        super(KicadNetlist, self).__init__(in_file, stats=stats)
         self.type = "kicad"
         self.load_netlist(in_file)
     
     def load_netlist(self, in_file):
         """
         """
-        fo = open(in_file, "r")
-        s = sexpdata.load(fo)
+        st = self.stats
+        with st.timer('parse.sexp'):
+            fo = open(in_file, "r")
+            s = sexpdata.load(fo)
         objs = []
         for elem in s:
             if isinstance(elem, sexpdata.Symbol):
@@ -405,14 +523,17 @@ class KicadNetlist(Netlist):
                     print('design')
                 elif elem[0].value() == 'components':
                     print('components')
-                    self.list_of_comps = KicadListOfComponents(elem)
+                    with st.timer('parse.parts'):
+                        self.list_of_comps = KicadListOfComponents(elem)
                 elif elem[0].value() == 'libparts':
                     print('libparts')
                 elif elem[0].value() == 'libraries':
                     print('libraries')
                 elif elem[0].value() == 'nets':
-                    self.list_of_nets = KicadListOfNets(elem)
+                    with st.timer('parse.nets'):
+                        self.list_of_nets = KicadListOfNets(elem)
                 objs.append(elem[0])
+        _count_loaded(self)
 
 class KicadListOfComponents(ListOfComponentsObj):
     """
@@ -634,21 +755,24 @@ class KicadNode(Node):
 class PadsNetlist(Netlist):
     """
     """
-    def __init__(self, net_file, prt_file=None):
-        super(PadsNetlist, self).__init__(net_file)
+    def __init__(self, net_file, prt_file=None, stats=None):
+        super(PadsNetlist, self).__init__(net_file, stats=stats)
         self.type = "pads"
         self.load_netlist()
         if prt_file == None:
             self.load_partlist(self.in_file)
         else:
             self.load_partlist(prt_file)
+        _count_loaded(self)
 
     def load_netlist(self):
-        nets = load_pads_netlist(self.in_file)
-        self.list_of_nets = PadsListOfNets(nets)
+        with self.stats.timer('parse.nets'):
+            nets = load_pads_netlist(self.in_file)
+            self.list_of_nets = PadsListOfNets(nets)
     
     def load_partlist(self, fi):
-        self.list_of_comps = PadsListOfComponents(fi) 
+        with self.stats.timer('parse.parts'):
+            self.list_of_comps = PadsListOfComponents(fi) 
         # try: 
         #     self.list_of_comps = PadsListOfComponents(fi) 
         # except:
@@ -766,6 +890,22 @@ class PadsComponent(Component):
 #       SHARED METHODS
 ######################################################################
 
+def _count_loaded(nl):
+    """
+    add the number of nets, nodes and components in a loaded
+    netlist to its stats counters
+    """
+    st = nl.stats
+    if not st.enabled:
+        return
+    nets = getattr(nl, 'list_of_nets', None)
+    comps = getattr(nl, 'list_of_comps', None)
+    if nets is not None:
+        st.count('nets_parsed', len(nets.nets))
+        st.count('nodes_parsed', sum(len(net.nodes) for net in nets.nets))
+    if comps is not None and comps.components is not None:
+        st.count('components_parsed', len(comps.components))
+
 def load_pads_complist(fi):
     """ 
     Take a PADS netlist file and returns a list of dicts for the 
@@ -900,6 +1040,30 @@ def compare_partlists(nl1, nl2):
     return p1, p2, d
 
 
+def compare_values(nl1, nl2):
+    """
+    Compare the values of the parts in both netlists. Values that are
+    written differently but are the same (1UF, 1.0uF) are not changes,
+    see value_utils.values_equal()
+    :Args:
+        :nl1 (Netlist()): old netlist
+        :nl2 (Netlist()): new netlist
+    :Returns (list):
+        list of dicts {'ref': <ref des>, 'old': <old value>, 'new': <new value>}
+        in alpha-numeric order of ref des
+    """
+    values1 = dict((c.ref, getattr(c, 'value', None)) for c in nl1.list_of_comps.components)
+    changes = {}
+    for c in nl2.list_of_comps.components:
+        old = values1.get(c.ref)
+        new = getattr(c, 'value', None)
+        if old is None or new is None:
+            continue
+        if not value_utils.values_equal(old, new):
+            changes[c.ref] = {'ref': c.ref, 'old': old, 'new': new}
+    return [changes[ref] for ref in sort_alpha_num(changes)]
+
+
 def compare_netlists(nl1, nl2):
     """
     Compare the parts lists for 2 netlists.
@@ -1086,11 +1250,12 @@ def correlate_nets(nl1, nl2, fo="corr_nets.txt"):
             # there is only one correlated net in the old netlist (n1) with
             # the new net name (k2) add it correlates exactly
             # 
-            n_map.append((k2, d[k2][0].keys()[0]))
-            new_to_old[k2] = d[k2][0].keys()[0]
-            old_to_new[d[k2][0].keys()[0]] = k2
+            old_key = next(iter(d[k2][0]))
+            n_map.append((k2, old_key))
+            new_to_old[k2] = old_key
+            old_to_new[old_key] = k2
             ret_dict['unchanged'].append(k2)
-            if k2 != d[k2][0].keys()[0]:
+            if k2 != old_key:
                 ret_dict['name_changed'].append(k2)
         else:
             # there is more than one correlation. need to find out 
@@ -1101,12 +1266,14 @@ def correlate_nets(nl1, nl2, fo="corr_nets.txt"):
             # print(d[k2]) 
             ret_dict['changed'].append(k2)
             # print(k2)
-            max_val = max(d[k2])    # find max value in the list of dicts
+            # find max value in the list of dicts
+            max_key, max_val = max([next(iter(item.items())) for item in d[k2]],
+                                   key=operator.itemgetter(1))
             # max_key = max(d.items(), key=operator.itemgetter(1))[0]
             # max_key = max(d, key=d.get)
             old_key = max_key
             old_names.append(old_key)
-            if find_occurences_in_list_of_dicts(d[k2], max_key) > 1:
+            if find_occurences_in_list_of_dicts(d[k2], max_val) > 1:
                 un_mapped.append(d[k2])
             else: 
                 # n_map.append((k2, d[k2][0].keys()[0]))
@@ -1122,7 +1289,7 @@ def correlate_nets(nl1, nl2, fo="corr_nets.txt"):
     for k in n1.keys():
         if k not in old_to_new.keys():
             old_to_new[k] = None
-            ret_dict['deleted'].append(k2)
+            ret_dict['deleted'].append(k)
         
 
     # return d, n_map, un_mapped, new_nets, new_to_old, old_to_new
@@ -1173,7 +1340,7 @@ def compare_nodes(nl1, nl2):
         old_net = nl1.list_of_nets.find_net_from_node(node)
         new_net = nl2.list_of_nets.find_net_from_node(node)
         if old_net and new_net:         # node is in both sets. check if moved
-            if new_to_old[new_net] == old_net:   # it's the same net, just the name is changed
+            if new_to_old.get(new_net) == old_net:   # it's the same net, just the name is changed
                 d['unchanged'].append(node)
             else:       # node is in both sets, but is moved
                 d['moved'].append(node)
@@ -1199,16 +1366,21 @@ def find_net_from_node(node, in_dict, in_keys):
         if node in in_dict[k]:
             return k
         
-def diff_netlist_files(file1, file2, diff_file="diff_net.txt", ignore_pins=False):
+def diff_netlist_files(file1, file2, diff_file="diff_net.txt", ignore_pins=False, stats=None):
     """
     Evaluate the netlists from both files and print the differences. Also,
     write to a diff_file if provided.
+    :Args:
+        :stats (None, bool or Stats): see kipy.stats.get_stats(). Pass
+                                      a Stats() to read the timings and
+                                      counters of each phase afterwards
     """
+    st = get_stats(stats)
     fname1 = file1.split("/")[-1]
     fname2 = file2.split("/")[-1]
     
-    nlst1 = PadsNetlist(file1)
-    nlst2 = PadsNetlist(file2)
+    nlst1 = PadsNetlist(file1, stats=st)
+    nlst2 = PadsNetlist(file2, stats=st)
 
     if diff_file != None:
         fo = open(diff_file, "w")
@@ -1225,26 +1397,40 @@ def diff_netlist_files(file1, file2, diff_file="diff_net.txt", ignore_pins=False
         fo.write(line)
 
     # PARTS DIFF
-    p1, p2, d = compare_partlists(nlst1, nlst2) 
-    output_parts_diff(p1, p2, d, fo=fo, col_width=col_width)
-
-    n1 = nlst1.list_of_nets.get_dict() 
-    n2 = nlst2.list_of_nets.get_dict() 
+    with st.timer('compare.parts'):
+        p1, p2, d = compare_partlists(nlst1, nlst2) 
+    output_parts_diff(p1, p2, d, fo=fo, col_width=col_width, stats=st)
+
+    with st.timer('get_dict'):
+        n1 = nlst1.list_of_nets.get_dict() 
+        n2 = nlst2.list_of_nets.get_dict() 
+    st.count('dict_rebuilds', 2)
     # nets_changed, nodes_changed = compare_nodes(nlst1, nlst2)
     # output_nets_diff(nlst1, nlst2, fo=fo, col_width=col_width)
-    write_nets_diff(nlst1, nlst2, fo=fo, col_width=col_width, ignore_pins=ignore_pins)
+    diff_nets(nlst1, nlst2, fo=fo, col_width=col_width, ignore_pins=ignore_pins, stats=st)
 
     if diff_file != None:
         fo.close()
-    
-    return
 
-def output_parts_diff(p1, p2, d, fo=None, col_width=50):
+def output_parts_diff(p1, p2, d, fo=None, col_width=50, stats=None):
     """
     :Args:
         :p1 (list of parts):
         :p2 (list of parts):
         :d (dict):
+        :stats (None, bool or Stats): see kipy.stats.get_stats()
+    """
+    st = get_stats(stats)
+    with st.timer('render.parts'):
+        line = format_parts_diff(p1, p2, d, col_width=col_width)
+        print(line),
+        if fo != None:
+            fo.write(line)
+    st.count('lines_rendered', line.count("\n"))
+
+def format_parts_diff(p1, p2, d, col_width=50):
+    """
+    return the parts diff from compare_partlists() as a str
     """
     ref_w = 8
     pn_w = col_width - ref_w
@@ -1274,9 +1460,7 @@ def output_parts_diff(p1, p2, d, fo=None, col_width=50):
     for k in d['changes']:
         ref = k['ref']
         line += ("{:<{ref_w}}{:<{pn_w}}|{:<{ref_w}}{:<{pn_w}}\n".format(ref, p1[ref], ref, p2[ref], ref_w=ref_w, pn_w=pn_w))
-    print(line),
-    if fo != None:
-        fo.write(line)
+    return line
 
 def output_nets_diff(nl1, nl2, fo=None, col_width=50):
     """
@@ -1343,21 +1527,26 @@ def output_nets_diff(nl1, nl2, fo=None, col_width=50):
     if fo != None:
         fo.write(line)
 
-def get_correlated_nets(list_of_nodes, nlst, keys_to_use=None, ignore_pins=False):
+def get_correlated_nets(list_of_nodes, nlst, keys_to_use=None, ignore_pins=False, stats=None):
     """
     :Args:
         :in_net (list): net, or list of nodes to look for correlation
         :in_netlist (Netlist): 
+        :stats (None, bool or Stats): see kipy.stats.get_stats()
     :Returns:
         list of dict of netnames as keys and values between 0 and 1 for the 
         level of correlation
     """
+    st = get_stats(stats)
     ret = []
-    nets = nlst.list_of_nets.get_dict()
+    with st.timer('get_dict'):
+        nets = nlst.list_of_nets.get_dict()
+    st.count('dict_rebuilds')
     if keys_to_use == None:
         compare_keys = nets.keys()
     else:
         compare_keys = keys_to_use
+    st.count('pairs_scored', len(compare_keys))
     for net in compare_keys:
         val = calc_node_correlation(list_of_nodes, nets[net], ignore_pins=ignore_pins)
         if val > 0.0:
@@ -1401,11 +1590,24 @@ def calc_node_correlation(node1, node2, ignore_pins=False):
     val = float(num_in_common)/(num_in_common + num_not_in_common)
     return val
 
-def map_nets(nl1, nl2, ignore_pins=True):
+def map_nets(nl1, nl2, ignore_pins=True, stats=None):
     """
+    :Args:
+        :nl1 (Netlist): old netlist
+        :nl2 (Netlist): new netlist
+        :stats (None, bool or Stats): see kipy.stats.get_stats()
     """
-    n1 = nl1.list_of_nets.get_dict()
-    n2 = nl2.list_of_nets.get_dict()
+    st = get_stats(stats)
+    with st.timer('correlate'):
+        ret = _map_nets(nl1, nl2, ignore_pins, st)
+    st.count('nets_mapped', len(ret))
+    return ret
+
+def _map_nets(nl1, nl2, ignore_pins, st):
+    with st.timer('get_dict'):
+        n1 = nl1.list_of_nets.get_dict()
+        n2 = nl2.list_of_nets.get_dict()
+    st.count('dict_rebuilds', 2)
     
     # make a separate list containing all the net names
     # in each netlist
@@ -1419,7 +1621,7 @@ def map_nets(nl1, nl2, ignore_pins=True):
         # print("B_NAME: {}".format(B_NAME)) 
         # gets a list of dicts of net names and the correlation value (0-1)
         # between the new net name (k2) and the old netlist n1 
-        corr_nets = get_correlated_nets(n2[B_NAME], nl1, keys_to_use=n1_keys, ignore_pins=ignore_pins)
+        corr_nets = get_correlated_nets(n2[B_NAME], nl1, keys_to_use=n1_keys, ignore_pins=ignore_pins, stats=st)
         if corr_nets == []:
             # no correlations. add this net name (k2) to the new_nets list
             ret.append(
@@ -1554,14 +1756,24 @@ def correlate_nets_based_on_nodes(nl1, nl2, ignore_pins=False):
 
     return ret
 
-def diff_nets(nl1, nl2, fo=None, col_width=50, ignore_pins=False):
+def diff_nets(nl1, nl2, fo=None, col_width=50, ignore_pins=False, stats=None):
     """
+    :Args:
+        :nl1 (Netlist): old netlist
+        :nl2 (Netlist): new netlist
+        :fo (str or file-object): file to which the diff is written
+        :stats (None, bool or Stats): see kipy.stats.get_stats()
+    :Returns:
+        list of the added nets
     """
+    st = get_stats(stats)
 
-    ret = map_nets(nl1, nl2, ignore_pins=ignore_pins)
+    ret = map_nets(nl1, nl2, ignore_pins=ignore_pins, stats=st)
 
-    nets1 = nl1.list_of_nets.get_dict()
-    nets2 = nl2.list_of_nets.get_dict()
+    with st.timer('get_dict'):
+        nets1 = nl1.list_of_nets.get_dict()
+        nets2 = nl2.list_of_nets.get_dict()
+    st.count('dict_rebuilds', 2)
 
     same = []
     deleted = []
@@ -1579,6 +1791,27 @@ def diff_nets(nl1, nl2, fo=None, col_width=50, ignore_pins=False):
         else:
             raise Exception("no type for net {}".format(r))
 
+    with st.timer('render.nets'):
+        line = format_nets_diff(changed, deleted, added, same, nets1, nets2, col_width=col_width)
+        print(line),
+        if fo != None:
+            if isinstance(fo, str):
+                with open(fo, "w") as f:
+                    f.write(line)
+            else:
+                fo.write(line)
+    st.count('lines_rendered', line.count("\n"))
+    return added
+
+def format_nets_diff(changed, deleted, added, same, nets1, nets2, col_width=50):
+    """
+    return the nets diff as a str
+    :Args:
+        :changed, deleted, added, same (lists): net mappings from map_nets()
+                                                grouped by their TYPE
+        :nets1 (dict): get_dict() of the old netlist
+        :nets2 (dict): get_dict() of the new netlist
+    """
     line = ""
     line += ("{:=<{w}}|{:=<{w}}\n".format("", "", w=col_width))
     line += ("{:<{w}}|{:<{w}}\n".format("NETLIST CHANGES", "NETLIST CHANGES", w=col_width))
@@ -1647,11 +1880,7 @@ def diff_nets(nl1, nl2, fo=None, col_width=50, ignore_pins=False):
             else:
                 line += ("{:<{w}}|{:<{w}}\n".format("    " + node, "    " + node ,  w=col_width))
 
-    print(line),
-    if fo != None:
-        fo = open(fo, "w")
-        fo.write(line)
-    return added
+    return line
 
 def quick_get_netlists(f1, f2):
     """
@@ -7,8 +7,18 @@ sch_utils.py
 :Description:
     This module is used for interacting with .sch files in KiCAD.
 
+:Usage:
+    >>> sch = Schematic("board.sch")
+    >>> for comp in sch.find_components(footprint="Resistor_SMD:R_0402*"):
+    ...     print(comp.ref, comp.value)
+    >>> sch.find_components(value="10K", lib_id="Device:R")
+
 """
+import re
 from datetime import datetime
+from fnmatch import fnmatchcase
+
+_wildcard_re = re.compile(r'[*?\[]')
 
 class Schematic(object):
     """
@@ -24,6 +34,7 @@ class Schematic(object):
         self.libs = []
         self.sheets = []
         self.components = []
+        self._indexes = {}  # { attribute : { value : [components] } }
 
         while True:
             line = fi.readline()
@@ -86,17 +97,172 @@ class Schematic(object):
             time = datetime(year, month, day, hour, minute, second)
         return version, time
 
+    def index(self, attribute):
+        """ return a dict { value : [components] } for a component
+        attribute (ref, lib_id, value, footprint, ...) or field name.
+        Each index is built on first use and kept
+
+        Parameters
+            attribute (str) - attribute of Component or a field name
+        """
+        idx = self._indexes.get(attribute)
+        if idx is None:
+            idx = {}
+            if attribute in Component.__slots__ or hasattr(Component, attribute):
+                get = lambda c: getattr(c, attribute)
+            else:
+                get = lambda c: c.field(attribute)
+            for comp in self.components:
+                idx.setdefault(get(comp), []).append(comp)
+            self._indexes[attribute] = idx
+        return idx
+
+    def find_components(self, **criteria):
+        """ return a list of the components matching all of the given
+        attributes or fields, in schematic order. Values may contain
+        shell wildcards (*, ?, [])
+
+        Parameters
+            criteria - attribute or field name = value,
+                       eg. footprint="Capacitor_SMD:C_0402*", value="100nF"
+        """
+        found = None
+        for attribute, pattern in criteria.items():
+            idx = self.index(attribute)
+            if isinstance(pattern, str) and _wildcard_re.search(pattern):
+                comps = [c for k, lst in idx.items()
+                         if k is not None and fnmatchcase(str(k), pattern) for c in lst]
+            else:
+                comps = idx.get(pattern, [])
+            ids = set(map(id, comps))
+            found = ids if found is None else found & ids
+            if not found:
+                return []
+        if found is None:
+            return list(self.components)
+        return [c for c in self.components if id(c) in found]
+
 class Sheet(object):
     """
     """
     def __init__(self):
         pass
 
-class Component(object):
+_field_re = re.compile(r'F\s+(\d+)\s+"((?:[^"\\]|\\.)*)"\s+(\S+)\s+(-?\d+)\s+(-?\d+)\s+(\d+)'
+                       r'\s+(\S+)(?:\s+(\S+))?(?:\s+(\S+))?(?:\s+"((?:[^"\\]|\\.)*)")?')
+
+# names of fields 0 to 3. Other fields carry their name on the F line
+FIELD_NAMES = ('Reference', 'Value', 'Footprint', 'Datasheet')
+
+class Field(object):
+    """ A field (F line) of a component
+        number (int) - 0 reference, 1 value, 2 footprint, 3 datasheet, 4...
+        name (str) - field name
+        text (str) - field text
+        orientation (str) - H or V
+        x, y (int) - position
+        size (int) - text size
+        flags (str) - visibility flags, eg. 0000 or 0001 (hidden)
+        justify (str) - horizontal justification and vertical justification
+                        and style, eg. "L CNN"
     """
+    __slots__ = ('number', 'name', 'text', 'orientation', 'x', 'y', 'size', 'flags', 'justify')
+
+    def __init__(self, line):
+        m = _field_re.match(line)
+        if m is None:
+            raise ValueError("cannot parse field: {}".format(line.strip()))
+        (number, text, self.orientation, x, y, size,
+         self.flags, hjustify, vjustify, name) = m.groups()
+        self.number = int(number)
+        self.text = text.replace('\\"', '"')
+        self.x = int(x)
+        self.y = int(y)
+        self.size = int(size)
+        self.justify = " ".join([j for j in (hjustify, vjustify) if j])
+        if name is not None:
+            self.name = name.replace('\\"', '"')
+        elif self.number < len(FIELD_NAMES):
+            self.name = FIELD_NAMES[self.number]
+        else:
+            self.name = "Field{}".format(self.number)
+
+    def __repr__(self):
+        return "Field({}, {!r})".format(self.name, self.text)
+
+class Component(object):
+    """ A component ($Comp block) of a schematic sheet
+        comp_str (str) - the $Comp ... $EndComp text as read
+        lib_id (str) - library symbol, eg. Device:R
+        ref (str) - reference designator as on the L line
+        unit (int) - unit of a multi-unit symbol
+        convert (int) - body style (De Morgan)
+        timestamp (str) - time stamp of the symbol
+        x, y (int) - position
+        fields (list of Field) - F lines, parsed on first access
+    The F lines are only decoded the first time fields (or value,
+    footprint, field(), ...) are used
     """
+    __slots__ = ('comp_str', 'lib_id', 'ref', 'unit', 'convert', 'timestamp', 'x', 'y', '_fields')
+
     def __init__(self, comp_str):
         self.comp_str = comp_str
+        self.lib_id = None
+        self.ref = None
+        self.unit = None
+        self.convert = None
+        self.timestamp = None
+        self.x = None
+        self.y = None
+        self._fields = None
+        for line in comp_str.split("\n"):
+            if line.startswith("L "):
+                s_line = line.split()
+                self.lib_id = s_line[1]
+                if len(s_line) > 2:
+                    self.ref = s_line[2]
+            elif line.startswith("U "):
+                s_line = line.split()
+                self.unit = int(s_line[1])
+                self.convert = int(s_line[2])
+                self.timestamp = s_line[3]
+            elif line.startswith("P "):
+                s_line = line.split()
+                self.x = int(s_line[1])
+                self.y = int(s_line[2])
+            elif line.startswith("F "):
+                break
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            self._fields = [Field(line) for line in self.comp_str.split("\n")
+                            if line.startswith("F ")]
+        return self._fields
+
+    def field(self, name):
+        """ return the text of the field with the given name (Value,
+        Footprint, MPN, ...) or None if there is no such field
+        """
+        for f in self.fields:
+            if f.name == name:
+                return f.text
+        return None
+
+    @property
+    def value(self):
+        return self.field("Value")
+
+    @property
+    def footprint(self):
+        return self.field("Footprint")
+
+    @property
+    def datasheet(self):
+        return self.field("Datasheet")
+
+    def __repr__(self):
+        return "Component({}, {})".format(self.ref, self.lib_id)
 
 class Description(object):
     """
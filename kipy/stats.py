@@ -0,0 +1,258 @@
+"""
+==============
+stats.py
+==============
+    :Description:
+        Lightweight per-phase timing and counter instrumentation for the
+        netlist loaders and diff functions.
+
+    :Usage:
+
+        >>> from kipy import netlist_utils
+        >>> from kipy.stats import Stats
+        >>> st = Stats()
+        >>> netlist_utils.diff_netlist_files("old.NET", "new.NET", stats=st)
+        >>> print(st.report())
+
+        Phases are timed with a context manager and counters are
+        incremented with count():
+
+        >>> st = Stats()
+        >>> with st.timer("parse"):
+        ...     st.count("nodes_parsed", 100)
+
+        Functions that accept a stats argument take None (instrumentation
+        off), True (create a new Stats()) or an existing Stats() object to
+        accumulate into. When off, a shared NullStats() is used whose timer
+        and counters do nothing.
+
+    :Memory profiling:
+
+        Stats(memory=True) also records the peak and retained allocations
+        of each phase with tracemalloc. They are included in report() and
+        as_dict() next to the timings.
+
+        >>> st = Stats(memory=True)
+        >>> nl = netlist_utils.PadsNetlist("old.NET", stats=st)
+        >>> print(st.report())
+
+"""
+import time
+import tracemalloc
+from collections import OrderedDict
+
+
+class PhaseTimer(object):
+    """
+    Context manager that adds the elapsed time of its block to a phase
+    """
+    __slots__ = ('stats', 'phase', 't0')
+
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        if self.stats.memory is not None:
+            self.stats._memory_enter()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stats.add_time(self.phase, time.perf_counter() - self.t0)
+        if self.stats.memory is not None:
+            self.stats._memory_exit(self.phase)
+        return False
+
+
+class _NullTimer(object):
+    """
+    Context manager that does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+class Stats(object):
+    """
+    Collects timings per phase and named counters.
+        :timings (OrderedDict): phase name -> [total seconds, number of calls]
+        :counters (OrderedDict): counter name -> int
+        :memory (OrderedDict): phase name -> {'peak': bytes, 'retained': bytes}
+                               or None if memory profiling is off
+    Phases may be nested. The time of a nested phase is also included
+    in the time of the phase that encloses it.
+
+    With memory=True, 'peak' is the largest allocation above the start of
+    the phase seen during any call and 'retained' is the largest amount
+    still allocated at the end of a call. tracemalloc is started for the
+    outermost phase (unless already tracing) and stopped after it.
+    """
+    enabled = True
+
+    def __init__(self, memory=False):
+        self.timings = OrderedDict()
+        self.counters = OrderedDict()
+        self.memory = OrderedDict() if memory else None
+        self._mem_stack = []
+        self._started_tracing = False
+
+    def timer(self, phase):
+        """
+        return a context manager that times a phase
+        """
+        return PhaseTimer(self, phase)
+
+    def add_time(self, phase, seconds):
+        t = self.timings.get(phase)
+        if t is None:
+            self.timings[phase] = [seconds, 1]
+        else:
+            t[0] += seconds
+            t[1] += 1
+
+    def count(self, name, n=1):
+        """
+        increment the named counter by n
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_memory(self, phase, peak, retained):
+        m = self.memory.get(phase)
+        if m is None:
+            self.memory[phase] = {'peak': peak, 'retained': retained}
+        else:
+            m['peak'] = max(m['peak'], peak)
+            m['retained'] = max(m['retained'], retained)
+
+    def _memory_enter(self):
+        if not self._mem_stack and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._mem_stack:
+            # the peak is reset below, so save the enclosing phase's peak so far
+            parent = self._mem_stack[-1]
+            parent[1] = max(parent[1], peak)
+        _reset_peak()
+        self._mem_stack.append([current, current])
+
+    def _memory_exit(self, phase):
+        start, peak_seen = self._mem_stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, peak_seen)
+        self.add_memory(phase, peak - start, current - start)
+        if self._mem_stack:
+            parent = self._mem_stack[-1]
+            parent[1] = max(parent[1], peak)
+        elif self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def merge(self, other):
+        """
+        add the timings and counters of other into this object
+        """
+        for phase, (seconds, calls) in other.timings.items():
+            t = self.timings.setdefault(phase, [0.0, 0])
+            t[0] += seconds
+            t[1] += calls
+        for name, n in other.counters.items():
+            self.count(name, n)
+        if self.memory is not None and other.memory:
+            for phase, m in other.memory.items():
+                self.add_memory(phase, m['peak'], m['retained'])
+        return self
+
+    def as_dict(self):
+        """
+        return the timings and counters as a dict suitable for json
+        """
+        d = {
+             'timings':  OrderedDict((k, {'seconds': v[0], 'calls': v[1]})
+                                     for k, v in self.timings.items()),
+             'counters': OrderedDict(self.counters),
+             }
+        if self.memory is not None:
+            d['memory'] = OrderedDict((k, dict(v)) for k, v in self.memory.items())
+        return d
+
+    def report(self):
+        """
+        return the timings and counters as a formatted table (str)
+        """
+        w = max([len(k) for k in list(self.timings) + list(self.counters)] + [16]) + 2
+        line = ""
+        if self.memory is None:
+            line += "{:<{w}}{:>8}{:>12}\n".format("PHASE", "CALLS", "SECONDS", w=w)
+            line += "{:-<{w}}\n".format("", w=w + 20)
+            for phase, (seconds, calls) in self.timings.items():
+                line += "{:<{w}}{:>8}{:>12.4f}\n".format(phase, calls, seconds, w=w)
+        else:
+            line += "{:<{w}}{:>8}{:>12}{:>14}{:>14}\n".format(
+                "PHASE", "CALLS", "SECONDS", "PEAK KB", "RETAINED KB", w=w)
+            line += "{:-<{w}}\n".format("", w=w + 48)
+            for phase, (seconds, calls) in self.timings.items():
+                m = self.memory.get(phase, {'peak': 0, 'retained': 0})
+                line += "{:<{w}}{:>8}{:>12.4f}{:>14.1f}{:>14.1f}\n".format(
+                    phase, calls, seconds, m['peak'] / 1024.0, m['retained'] / 1024.0, w=w)
+        line += "\n"
+        line += "{:<{w}}{:>20}\n".format("COUNTER", "VALUE", w=w)
+        line += "{:-<{w}}\n".format("", w=w + 20)
+        for name, n in self.counters.items():
+            line += "{:<{w}}{:>20}\n".format(name, n, w=w)
+        return line
+
+    def __repr__(self):
+        return "Stats(timings={}, counters={})".format(
+            dict((k, round(v[0], 6)) for k, v in self.timings.items()), dict(self.counters))
+
+
+class NullStats(Stats):
+    """
+    Stats() that records nothing. Used when instrumentation is off.
+    """
+    enabled = False
+
+    def timer(self, phase):
+        return _NULL_TIMER
+
+    def add_time(self, phase, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def merge(self, other):
+        return self
+
+NULL_STATS = NullStats()
+
+
+def _reset_peak():
+    # tracemalloc.reset_peak() is only available from python 3.9. Before that
+    # the peak of a phase is the peak since tracing started.
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+def get_stats(stats=None):
+    """
+    return the Stats() object to use for the given stats argument
+    :Args:
+        :stats (None, bool or Stats): None or False to turn instrumentation off,
+                                      True to create a new Stats(), or a Stats()
+                                      object to accumulate into
+    """
+    if stats is None or stats is False:
+        return NULL_STATS
+    if stats is True:
+        return Stats()
+    return stats
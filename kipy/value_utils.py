@@ -0,0 +1,235 @@
+"""
+==============
+value_utils.py
+==============
+    :Description:
+        Parse the value field of resistors, capacitors and inductors
+        (10K, 4K7, 100nF 16V, 1.0uF, 2.2UH 10%) into numbers so that
+        values written differently compare equal.
+
+    :Usage:
+
+        >>> from kipy import value_utils
+        >>> value_utils.parse_value("100nF 16V X7R")
+        EngValue(number=1e-07, unit='F', tolerance=None, voltage=16.0, extra=('X7R',))
+        >>> value_utils.values_equal("1UF", "1.0uF")
+        True
+        >>> value_utils.values_equal("4K7", "4.7K OHM")
+        True
+
+        Strings that aren't an engineering value (part numbers, DNI)
+        parse to None and are compared as upper case strings. A bare
+        number with a leading zero (0603, 0402) is taken as a footprint
+        size, not a value.
+
+        Each distinct string is parsed once and cached, so a whole BOM
+        column can be parsed with parse_values() at the cost of the
+        number of distinct values in it.
+
+    :Notes:
+
+        An upper case M is mega (1M resistor) unless the unit is F or H,
+        where it is milli (1MH). MEG is always mega. R as the multiplier
+        is ohms (100R, 4R7). An upper case M with an ohm unit (100MOHM)
+        could be an upper cased 100mOhm shunt or a 100 megohm resistor,
+        so it doesn't parse and is compared as a string.
+
+"""
+import re
+from collections import namedtuple
+
+EngValue = namedtuple('EngValue', ['number', 'unit', 'tolerance', 'voltage', 'extra'])
+EngValue.__doc__ = """
+A parsed value
+    :number (float): the value in ohms, farads or henries, rounded to 9 significant digits
+    :unit (str): 'OHM', 'F', 'H' or '' if not given (10K, 1u)
+    :tolerance (float): tolerance in percent, or None
+    :voltage (float): voltage rating in volts, or None
+    :extra (tuple): other words in the value (X7R, C0G, ...), upper case
+"""
+
+_multipliers = {
+                'P':    1e-12,
+                'N':    1e-9,
+                'U':    1e-6,
+                '\u039c': 1e-6,   # micro sign or greek mu, upper case
+                'm':    1e-3,
+                'K':    1e3,
+                'MEG':  1e6,
+                'G':    1e9,
+                'T':    1e12,
+                'R':    1.0,
+                }
+
+_units = {
+          'OHM':    'OHM',
+          'OHMS':   'OHM',
+          '\u03a9': 'OHM',  # greek omega
+          '\u2126': 'OHM',  # ohm sign
+          'F':      'F',
+          'FD':     'F',
+          'FARAD':  'F',
+          'FARADS': 'F',
+          'H':      'H',
+          'HENRY':  'H',
+          'HENRYS': 'H',
+          }
+
+_value_re = re.compile('^(\\d+(?:\\.\\d*)?|\\.\\d+)(meg|[pnu\u00b5\u03bc\u039cmkgtr])?(\\d*)'
+                       '(ohms?|\u03a9|\u2126|fd|farads?|f|henrys?|h)?$', re.I)
+_tolerance_re = re.compile('^\u00b1?(\\d+(?:\\.\\d*)?|\\.\\d+)%$')
+_voltage_re = re.compile(r'^(\d+(?:\.\d*)?|\.\d+)(K?)V(\d*)(?:DC)?$', re.I)
+_split_re = re.compile(r'[\s/,;]+')
+
+_value_cache = {}   # { string as given : EngValue or None }
+
+
+def _round(x):
+    return float('%.9g' % x)
+
+
+def _parse_number(m):
+    """ return (number, unit) for a match of _value_re """
+    whole, prefix, frac, unit = m.groups()
+    if frac and (prefix is None or '.' in whole):
+        return None
+    if prefix is None and unit is None and len(whole) > 1 and whole[0] == '0' and whole[1].isdigit():
+        return None     # footprint sizes like 0603
+    if len(frac) > 2 and prefix.upper() != 'R':
+        return None     # part numbers like 1N4148 and 2N2222, not 1.4148 nF
+    unit = _units[unit.upper()] if unit else ''
+    if prefix == 'M' and unit == 'OHM':
+        return None     # milliohm or megohm, see the notes above
+    if prefix is None:
+        mult = 1.0
+    elif prefix.upper() == 'MEG':
+        mult = 1e6
+    elif prefix == 'm' or (prefix == 'M' and unit in ('F', 'H')):
+        mult = 1e-3
+    elif prefix == 'M':
+        mult = 1e6
+    else:
+        mult = _multipliers[prefix.upper()]
+    if prefix is not None and prefix.upper() == 'R':
+        if unit not in ('', 'OHM'):
+            return None
+        unit = 'OHM'
+    number = float(whole + '.' + frac) if frac else float(whole)
+    return _round(number * mult), unit
+
+
+def _parse(text):
+    number = None
+    unit = ''
+    tolerance = None
+    voltage = None
+    extra = []
+    prefix = None
+    for tok in _split_re.split(text.strip().replace('+/-', '\u00b1')):
+        if not tok:
+            continue
+        if number is not None and not unit and tok.upper() in _units:
+            unit = _units[tok.upper()]     # 10K OHM
+            if prefix == 'M' and unit == 'OHM':
+                return None
+            continue
+        if number is None:
+            m = _value_re.match(tok)
+            if m is not None:
+                res = _parse_number(m)
+                if res is not None:
+                    number, unit = res
+                    prefix = m.group(2)
+                    continue
+        if tolerance is None:
+            m = _tolerance_re.match(tok)
+            if m is not None:
+                tolerance = float(m.group(1))
+                continue
+        if voltage is None:
+            m = _voltage_re.match(tok)
+            if m is not None:
+                whole, kilo, frac = m.groups()
+                volts = float(whole + '.' + frac) if frac else float(whole)
+                voltage = _round(volts * (1e3 if kilo else 1.0))
+                continue
+        extra.append(tok.upper())
+    if number is None:
+        return None
+    return EngValue(number, unit, tolerance, voltage, tuple(extra))
+
+
+def parse_value(text):
+    """
+    return the EngValue for a value string, or None if it isn't an
+    engineering value. Results are cached per distinct string
+    :Args:
+        :text (str or number): value field of a BOM line or component
+    """
+    try:
+        return _value_cache[text]
+    except KeyError:
+        pass
+    if isinstance(text, (int, float)):
+        res = EngValue(_round(text), '', None, None, ())
+    else:
+        res = _parse(str(text))
+    _value_cache[text] = res
+    return res
+
+
+def parse_values(texts):
+    """
+    return a list with the EngValue (or None) of each string in texts.
+    Repeated strings are parsed once
+    """
+    cache = _value_cache
+    res = []
+    for text in texts:
+        v = cache.get(text, cache)
+        if v is cache:
+            v = parse_value(text)
+        res.append(v)
+    return res
+
+
+def value_key(text):
+    """
+    return a hashable key that is the same for values that are written
+    differently but parse to the same EngValue. The unit is left out, as
+    it is for values_equal(), so 1u and 1UF have the same key. Strings
+    that don't parse are their own key (upper case, stripped)
+    """
+    v = parse_value(text)
+    if v is None:
+        return str(text).strip().upper()
+    if v.unit:
+        return v._replace(unit='')
+    return v
+
+
+def values_equal(a, b):
+    """
+    True if the value strings a and b are the same value. A unit,
+    tolerance, voltage or other words (X7R, 0603) given on one side only
+    do not make them differ, so 100nF and 100nF 16V X7R are equal, but
+    100nF 16V and 100nF 25V are not. If either doesn't parse they are
+    compared as upper case strings. value_key() is stricter, it keeps
+    the tolerance, voltage and other words
+    """
+    if a == b:
+        return True
+    va = parse_value(a)
+    vb = parse_value(b)
+    if va is None or vb is None:
+        return str(a).strip().upper() == str(b).strip().upper()
+    return (va.number == vb.number and
+            (va.unit == vb.unit or not va.unit or not vb.unit) and
+            (va.tolerance == vb.tolerance or va.tolerance is None or vb.tolerance is None) and
+            (va.voltage == vb.voltage or va.voltage is None or vb.voltage is None) and
+            (va.extra == vb.extra or not va.extra or not vb.extra))
+
+
+def clear_cache():
+    """ forget all parsed values """
+    _value_cache.clear()
@@ -0,0 +1,333 @@
+import io
+import bz2
+import gzip
+import lzma
+import os
+import pickle
+import time
+import shutil
+import tempfile
+import contextlib
+from unittest import TestCase
+
+from kipy import netlist_utils
+from kipy.check_nets import NetID, NetIndex, NetList, MissingNet, InvalidFormat, iter_netlist_lines, load_netlists
+
+OLD_ASC = """*PADS-PCB*
+*PART*
+R1 R0402
+R2 R0402
+C1 C0402
+U1 QFN16
+*NET*
+*SIGNAL* VCC
+U1.1 R1.1 C1.1
+*SIGNAL* GND
+U1.2 C1.2 R2.2
+*SIGNAL* SIG
+U1.3 R1.2 R2.1
+*END*
+"""
+
+NEW_ASC = """*PADS-PCB*
+*PART*
+R1 R0402
+R2 R0402
+C1 C0402
+U1 QFN16
+*NET*
+*SIGNAL* VCC
+U1.1 R1.2 C1.1
+*SIGNAL* GND
+U1.2 C1.2 R2.2
+*SIGNAL* SIG
+U1.3 R1.1 R2.1
+*END*
+"""
+
+
+def load(text, **kwds):
+    return NetList(io.StringIO(text), netlist_format='pads', **kwds)
+
+
+class TestNetIndex(TestCase):
+
+    def test_reverse_lookup_tracks_changes(self):
+        a = NetID(['R1.1', 'R2.1'])
+        b = NetID(['R1.2', 'R2.2'])
+        index = NetIndex({a: 'N1'})
+        index[b] = 'N2'
+        self.assertEqual(index.find_by_value('N2'), b)
+        index[a] = 'N3'
+        self.assertEqual(index.find_by_value('N3'), a)
+        self.assertRaises(ValueError, index.find_by_value, 'N1')
+        del index[b]
+        self.assertRaises(ValueError, index.find_by_value, 'N2')
+        self.assertEqual(index.pop(a), 'N3')
+        self.assertEqual(index.reverse, {})
+
+    def test_duplicate_values_fall_back(self):
+        a = NetID(['R1.1'])
+        b = NetID(['R2.1'])
+        index = NetIndex()
+        index[a] = 'N1'
+        index[b] = 'N1'
+        self.assertEqual(index.find_by_value('N1'), a)
+        del index[a]
+        self.assertEqual(index.find_by_value('N1'), b)
+
+    def test_fallback_after_overwrites(self):
+        a = NetID(['R1.1'])
+        b = NetID(['R2.1'])
+        c = NetID(['R3.1'])
+        index = NetIndex()
+        for key in [a, b, c]:
+            index[key] = 'N1'
+        index[a] = 'N2'
+        self.assertEqual(index.find_by_value('N1'), b)
+        del index[c]
+        index[b] = 'N3'
+        self.assertRaises(ValueError, index.find_by_value, 'N1')
+        self.assertEqual(index._others, {})
+
+    def test_same_value_again_keeps_first(self):
+        a = NetID(['R1.1'])
+        b = NetID(['R2.1'])
+        index = NetIndex()
+        index[a] = 'N1'
+        index[b] = 'N1'
+        index[a] = 'N1'
+        self.assertEqual(index.find_by_value('N1'), a)
+        del index[a]
+        self.assertEqual(index.find_by_value('N1'), b)
+        self.assertEqual(index._others, {})
+
+    def test_pickle_keeps_reverse(self):
+        index = pickle.loads(pickle.dumps(NetIndex({NetID(['R1.1']): 'N1'})))
+        self.assertIsInstance(index, NetIndex)
+        self.assertEqual(index.find_by_value('N1'), NetID(['R1.1']))
+
+    def test_copy_keeps_reverse(self):
+        index = NetIndex({NetID(['R1.1']): 'N1'})
+        self.assertEqual(index.copy().find_by_value('N1'), NetID(['R1.1']))
+
+
+class TestNetList(TestCase):
+
+    def test_find_nodes_on_net(self):
+        nl = load(OLD_ASC)
+        nl.build_index_ignoring_certain_pins()
+        self.assertEqual(nl.find_nodes_on_net('VCC'), NetID(['U1.1', 'R1.1', 'C1.1']))
+        self.assertRaises(MissingNet, nl.find_nodes_on_net, 'NOPE')
+
+    def test_ignore_pins_index_is_cached(self):
+        nl = load(OLD_ASC, ignorepins=True)
+        index2 = nl.build_index_ignoring_certain_pins()
+        self.assertIs(nl.build_index_ignoring_certain_pins(), index2)
+        self.assertEqual(index2[NetID(['U1.1', 'R1', 'C1'])], 'VCC')
+        nl.ignore_pins_prefix = ['R']
+        self.assertEqual(nl.build_index_ignoring_certain_pins()[NetID(['U1.1', 'R1', 'C1.1'])], 'VCC')
+        nl.ignore_pins_prefix = []
+        self.assertIs(nl.build_index_ignoring_certain_pins(), nl.index)
+        nl.ignore_pins_prefix = ['R', 'C', 'L']
+        nl.make_index()
+        self.assertIsNot(nl.build_index_ignoring_certain_pins(), index2)
+
+    def test_compare_netlist2(self):
+        old = load(OLD_ASC)
+        new = load(NEW_ASC)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            old.compareNetList2(new)
+        self.assertIn("VCC !!! NO MATCH", out.getvalue())
+        self.assertNotIn("GND", out.getvalue())
+
+        old = load(OLD_ASC, ignorepins=True)
+        new = load(NEW_ASC, ignorepins=True)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            old.compareNetList2(new)
+        self.assertEqual(out.getvalue(), "")
+
+    def test_find_nets_on_part(self):
+        nl = load(OLD_ASC)
+        self.assertEqual(nl.find_nets_on_part('u1'), [('U1.1', 'VCC'), ('U1.2', 'GND'), ('U1.3', 'SIG')])
+        self.assertEqual(nl.find_nets_on_part('X9'), [])
+        parts = nl.find_nets_on_parts(['C1', 'R*'])
+        self.assertEqual(list(parts), ['C1', 'R1', 'R2'])
+        self.assertEqual(parts['R2'], [('R2.1', 'SIG'), ('R2.2', 'GND')])
+
+    def test_find_permuted_parts(self):
+        old = load(OLD_ASC)
+        new = load(NEW_ASC)
+        self.assertEqual(old.find_permuted_parts(new),
+                         [{'ref': 'R1', 'pins': [('R1.1', 'VCC', 'SIG'), ('R1.2', 'SIG', 'VCC')]}])
+        # nets that were only renamed are matched by their connections
+        renamed = load(NEW_ASC.replace("*SIGNAL* GND", "*SIGNAL* AGND"))
+        self.assertEqual([p['ref'] for p in old.find_permuted_parts(renamed)], ['R1'])
+        # renamed and the pins changed, matched on most of its pins
+        renamed = load(NEW_ASC.replace("*SIGNAL* SIG", "*SIGNAL* SIGX"))
+        self.assertEqual(old.find_permuted_parts(renamed),
+                         [{'ref': 'R1', 'pins': [('R1.1', 'VCC', 'SIGX'), ('R1.2', 'SIGX', 'VCC')]}])
+        # a 3-way rotation
+        rotated = load(OLD_ASC.replace("U1.1 R1.1 C1.1", "U1.2 R1.1 C1.1")
+                              .replace("U1.2 C1.2 R2.2", "U1.3 C1.2 R2.2")
+                              .replace("U1.3 R1.2 R2.1", "U1.1 R1.2 R2.1"))
+        parts = old.find_permuted_parts(rotated)
+        self.assertEqual([p['ref'] for p in parts], ['U1'])
+        self.assertEqual(parts[0]['pins'][0], ('U1.1', 'VCC', 'SIG'))
+        self.assertEqual(old.find_permuted_parts(load(OLD_ASC)), [])
+
+    def test_verify_pins(self):
+        nl = load(OLD_ASC)
+        res = nl.verify_pins(io.StringIO("""RefDes,Pin,Net
+U1,1,VCC
+U1,2,SIG
+U1,3,
+U1,4,
+R1,1,NOPE
+"""))
+        self.assertEqual(res['totals'], {'rows': 5, 'mismatches': 3, 'verified': 1, 'not_connected': 1})
+        self.assertEqual([(m['ref'], m['pin'], m['status'], m['netlist_net']) for m in res['mismatches']],
+                         [('U1', '2', 'not_connected', 'GND'),
+                          ('U1', '3', 'not_in_csv', 'SIG'),
+                          ('R1', '1', 'no_such_net', 'VCC')])
+        self.assertEqual(res['bad_rows'], [])
+
+    def test_verify_pins_bad_rows(self):
+        nl = load(OLD_ASC)
+        res = nl.verify_pins(io.StringIO("""RefDes,Pin,Net
+U1,1,VCC
+U1
+,2,SIG
+U1,2,SIG
+"""))
+        self.assertEqual(res['totals'], {'rows': 2, 'mismatches': 1, 'verified': 1, 'not_connected': 0})
+        self.assertEqual([line for line, msg in res['bad_rows']], [3, 4])
+        with self.assertRaises(InvalidFormat) as cm:
+            nl.verify_pins(io.StringIO("RefDes,Net\nU1,VCC\n"))
+        self.assertEqual(cm.exception.value, '1: Expected Pin column(s) in pin list')
+
+    def test_pin_conflicts(self):
+        text = OLD_ASC.replace("U1.3 R1.2 R2.1", "U1.3 R1.2 R2.1 U1.1 C1.2")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            nl = load(text)
+        self.assertEqual(out.getvalue().count("\n"), 1)
+        self.assertEqual(nl.pin_conflicts, {'U1.1': ['VCC', 'SIG'], 'C1.2': ['GND', 'SIG']})
+        self.assertEqual(nl.pins['U1.1'], 'VCC')
+        fo = io.StringIO()
+        nl.write_pin_conflicts(fo)
+        self.assertEqual(fo.getvalue().splitlines(), ['Pin,Nets', 'C1.2,GND SIG', 'U1.1,VCC SIG'])
+        nl.make_index()
+        self.assertEqual(nl.pin_conflicts, {'U1.1': ['VCC', 'SIG'], 'C1.2': ['GND', 'SIG']})
+
+    def test_find_closest_match(self):
+        new = load("""*PART*
+*NET*
+*SIGNAL* RENAMED
+U1.1 R1.1 R2.1 R3.1 R4.1
+*SIGNAL* OVERLAP
+U2.1 U2.2 U2.3 R5.1
+*SIGNAL* OTHER
+U2.4 R6.1
+*END*
+""")
+        self.assertEqual(new.findClosestMatch(NetID(['U1.1', 'R1.1', 'R2.1', 'R3.1']), 'OLD'), 'RENAMED')
+        self.assertEqual(new.findClosestMatch(NetID(['U2.1', 'U2.2', 'U2.3', 'U2.4']), 'OLD'), 'OVERLAP')
+        self.assertEqual(new.findClosestMatch(NetID(['U2.4', 'R7.1']), 'OLD'), None)
+        self.assertEqual(new.findClosestMatch(NetID(['X1.1']), 'OTHER'), 'OTHER')
+
+PADS_FILE = os.path.join(os.path.dirname(__file__), "..", "kipy", "netlist_files", "pi-hat-lna_pads.NET")
+
+EAGLE_NET = """Netlist
+
+Exported from test.sch
+
+EAGLE Version 7.7.0
+
+Net      Part     Pad      Pin        Sheet
+
+VCC      U1       1        VCC        1
+         R1       1        1          1
+
+GND      U1       2        GND        1
+         C1       2        2          1
+"""
+
+
+class TestLoading(TestCase):
+
+    def test_compressed_streams(self):
+        plain = load(OLD_ASC)
+        data = OLD_ASC.encode()
+        for compressed in [gzip.compress(data), lzma.compress(data), bz2.compress(data),
+                           gzip.compress(data[:40]) + gzip.compress(data[40:])]:
+            nl = NetList(io.BytesIO(compressed), netlist_format='pads')
+            self.assertEqual(nl.nets, plain.nets)
+            self.assertEqual(nl.parts, plain.parts)
+            self.assertEqual(dict(nl.index), dict(plain.index))
+
+    def test_lines_split_across_chunks(self):
+        lines = list(iter_netlist_lines(io.BytesIO(OLD_ASC.encode()), chunk_size=7))
+        self.assertEqual(lines, OLD_ASC.splitlines())
+
+    def test_encoding(self):
+        text = OLD_ASC.replace('*SIGNAL* SIG', '*SIGNAL* 10\u00b5A')
+        nl = NetList(io.BytesIO(text.encode('cp1252')), netlist_format='pads', encoding='cp1252')
+        self.assertIn('10\u00b5A', nl.nets)
+        lines = list(iter_netlist_lines(io.BytesIO(text.encode('utf-8')), chunk_size=3, encoding='utf-8'))
+        self.assertEqual(lines, text.splitlines())
+        with self.assertRaises(UnicodeDecodeError):
+            NetList(io.BytesIO(text.encode('cp1252')), netlist_format='pads', encoding='utf-8')
+
+    def test_eagle(self):
+        nl = NetList(io.StringIO(EAGLE_NET), netlist_format='eagle', ignorepins=True)
+        self.assertEqual(nl.nets, {'VCC': set(['U1.1', 'R1.1']), 'GND': set(['U1.2', 'C1.2'])})
+        self.assertEqual(nl.index[NetID(['U1.2', 'C1.2'])], 'GND')
+        self.assertEqual(nl.pin_index['R1.1'], set(['VCC']))
+
+    def test_many_pinless_nets(self):
+        # pinless nets all share the empty NetID, each one overwrites the last
+        text = ("*PADS-PCB*\n*PART*\n*NET*\n" +
+                "".join("*SIGNAL* N%d\nR%d.1 R%d.2\n" % (k, k, k) for k in range(20000)) +
+                "".join("*SIGNAL* E%d\n" % k for k in range(5000)) + "*END*\n")
+        t0 = time.perf_counter()
+        nl = load(text)
+        self.assertLess(time.perf_counter() - t0, 5.0)
+        self.assertEqual(nl.index[NetID()], 'E4999')
+        self.assertEqual(nl.index.find_by_value('N7'), NetID(['R7.1', 'R7.2']))
+        self.assertRaises(ValueError, nl.index.find_by_value, 'E0')
+
+    def test_index_matches_make_index(self):
+        nl = load(OLD_ASC)
+        index, pin_index, ref_index = dict(nl.index), nl.pin_index, nl.ref_index
+        nl.make_index()
+        self.assertEqual(dict(nl.index), index)
+        self.assertEqual(nl.pin_index, pin_index)
+        self.assertEqual(nl.ref_index, ref_index)
+
+    def test_load_netlists_in_processes(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        files = []
+        for name, text in [('old.asc', OLD_ASC), ('new.asc', NEW_ASC)]:
+            files.append(os.path.join(tmp, name))
+            with open(files[-1], 'w') as fo:
+                fo.write(text)
+        old, new = load_netlists(files, netlist_format='pads', parallel=True)
+        self.assertEqual(old.nets, load(OLD_ASC).nets)
+        self.assertEqual(new.index.find_by_value('VCC'), NetID(['U1.1', 'R1.2', 'C1.1']))
+        self.assertEqual(old.find_permuted_parts(new)[0]['ref'], 'R1')
+
+    def test_from_netlist_shares_node_sets(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = netlist_utils.PadsNetlist(PADS_FILE)
+            parsed = NetList(PADS_FILE, netlist_format='pads')
+        nl = NetList.from_netlist(model)
+        self.assertEqual(nl.nets, parsed.nets)
+        self.assertEqual(dict(nl.index), dict(parsed.index))
+        self.assertEqual(nl.parts, parsed.parts)
+        node_sets = model.list_of_nets.get_node_sets()
+        self.assertIs(nl.nets['GND'], node_sets['GND'])
+        self.assertEqual(nl.find_permuted_parts(parsed), [])
@@ -0,0 +1,422 @@
+import io
+import os
+import csv
+import json
+import pickle
+import random
+import shutil
+import tempfile
+import subprocess
+import sys
+import contextlib
+from unittest import TestCase, mock
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from kipy import compare_boms
+from kipy import netlist_utils
+from kipy.compare_boms import BOM, BOMReader, VariantMatrix, RefDesList, BadRefDes, split_refdes_list
+
+OLD_BOM = """Designator,Manufacturer,Part Number,Description,Value,Qty
+"R1,R2",YAGEO,RC0402-10K,RES 10K,10K,2
+C1,MURATA,GRM-100N,CAP 100NF,100NF,1
+U1,ANALOG DEVICES INC,AD9361,TRANSCEIVER,AD9361,1
+"""
+
+NEW_BOM = """Designator,Manufacturer,Part Number,Description,Value,Qty
+"R1,R2,R3",YAGEO,RC0402-10K,RES 10K,10K,3
+U1,ANALOG,AD9361,TRANSCEIVER,AD9361,1
+C2,MURATA,GRM-1U,CAP 1UF,1UF,1
+"""
+
+
+def load(text):
+    return BOM(io.StringIO(text))
+
+
+class TestBOM(TestCase):
+
+    def test_find_part(self):
+        bom = load(OLD_BOM)
+        self.assertEqual(bom.findPart('partnumber', 'AD9361').refs, set(['U1']))
+        self.assertEqual(bom.findPart('value', '10K').partnumber, 'RC0402-10K')
+        self.assertRaises(ValueError, bom.findPart, 'partnumber', 'NOPE')
+        bom.parts[0].partnumber = 'RC0402-10K-X'
+        bom.reindex()
+        self.assertEqual(bom.findPart('partnumber', 'RC0402-10K-X').refs, set(['R1', 'R2']))
+
+    def test_compare(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            load(OLD_BOM).compare(load(NEW_BOM))
+        self.assertEqual(out.getvalue().splitlines(), [
+            "Part RC0402-10K: The new BOM       adds ref des R3",
+            "Missing part GRM-100N in new BOM / C1",
+            "Old BOM is missing part GRM-1U / C2"])
+
+
+class TestBOMReader(TestCase):
+
+    def test_delimiters(self):
+        expected = [(p.partnumber, p.refs, p.quant) for p in load(OLD_BOM).parts]
+        tsv = OLD_BOM.replace('"R1,R2"', 'R1;R2').replace(',', '\t').replace('R1;R2', 'R1,R2')
+        semi = OLD_BOM.replace(',', ';').replace('"R1;R2"', '"R1,R2"')
+        for text in [tsv, semi]:
+            reader = BOMReader(io.StringIO("Exported BOM\n\n" + text + "\n\n"))
+            self.assertEqual([(p.partnumber, p.refs, p.quant) for p in reader], expected)
+
+    def test_parts_are_slotted(self):
+        part = next(iter(BOMReader(io.StringIO(OLD_BOM))))
+        self.assertFalse(hasattr(part, '__dict__'))
+        self.assertEqual(part.value, '10K')
+
+
+class TestRefDesList(TestCase):
+
+    def test_from_text(self):
+        text = "C12, C1-C10,R3,TP01,C11"
+        refs = RefDesList.from_text(text)
+        self.assertEqual(refs, RefDesList(split_refdes_list(text)))
+        self.assertEqual(len(refs), 14)
+        self.assertEqual(refs.runs, {'C': ((1, 12),), 'R': ((3, 3),)})
+        self.assertEqual(refs.compressed(), "C1-C12,R3,TP01")
+        self.assertEqual(refs.sorted()[:3], ['C1', 'C2', 'C3'])
+        self.assertIn('C7', refs)
+        self.assertIn('TP01', refs)
+        self.assertNotIn('C13', refs)
+        self.assertNotIn('TP1', refs)
+        self.assertRaises(BadRefDes, RefDesList.from_text, "C5-C1")
+
+    def test_long_runs_stay_readable(self):
+        refs = RefDesList.from_text("C1-C1001,C1002-C2000,C2002,C2003")
+        self.assertEqual(refs.compressed(), "C1-C1001,C1002-C2000,C2002,C2003")
+        self.assertEqual(RefDesList.from_text(refs.compressed()), refs)
+
+    def test_set_operations(self):
+        rnd = random.Random(1)
+        for k in range(50):
+            a = set("C%d" % rnd.randint(1, 40) for n in range(30))
+            b = set("C%d" % rnd.randint(1, 40) for n in range(30)) | set(['R1'])
+            ra, rb = RefDesList(a), RefDesList(b)
+            self.assertEqual(set(ra | rb), a | b)
+            self.assertEqual(set(ra & rb), a & b)
+            self.assertEqual(set(ra - rb), a - b)
+            self.assertEqual(ra - rb, a - b)
+            self.assertEqual(len(ra - rb), len(a - b))
+
+    def test_hash_like_frozenset(self):
+        refs = frozenset(['C1', 'C2', 'C3', 'R1', 'J1A'])
+        ra = RefDesList(refs)
+        self.assertEqual(ra, refs)
+        self.assertEqual(hash(ra), hash(refs))
+        self.assertEqual(len(set([ra, refs, RefDesList.from_text('C1-C3,R1,J1A')])), 1)
+        self.assertFalse(ra != set(refs))
+        self.assertTrue(ra != RefDesList(['C1']))
+        self.assertEqual(hash(pickle.loads(pickle.dumps(ra))), hash(refs))
+
+
+class TestVariantMatrix(TestCase):
+
+    def test_matrix_and_ecos(self):
+        dni = OLD_BOM.replace("U1,ANALOG DEVICES INC,AD9361,TRANSCEIVER,AD9361,1",
+                              "U1,ANALOG DEVICES INC,AD9361,TRANSCEIVER,DNI,1")
+        boms = [load(OLD_BOM), load(NEW_BOM), load(dni)]
+        matrix = VariantMatrix(boms, names=['A', 'B', 'C'])
+        self.assertEqual(list(matrix.rows(only_differences=True)), [
+            ['RefDes', 'A', 'B', 'C'],
+            ['C1', 'GRM-100N', '', 'GRM-100N'],
+            ['C2', '', 'GRM-1U', ''],
+            ['R3', '', 'RC0402-10K', ''],
+            ['U1', 'AD9361', 'AD9361', 'DNI']])
+        self.assertEqual(len(list(matrix.rows())), 7)
+        ecos = matrix.pairwise_ECOs()
+        self.assertEqual(len(ecos), 6)
+        for (a, b), eco in ecos.items():
+            expected = boms['ABC'.index(a)].calculateECO(boms['ABC'.index(b)])
+            self.assertEqual(sorted(eco, key=lambda x: x[:2]), sorted(expected, key=lambda x: x[:2]))
+
+
+class TestManufacturers(TestCase):
+
+    def test_canonical_names(self):
+        self.assertEqual(compare_boms.canonical_mfg("Analog Devices, Inc."), "ANALOG")
+        self.assertEqual(compare_boms.canonical_mfg("Murata Manufacturing Co., Ltd."), "MURATA MANUFACTURING")
+        self.assertTrue(compare_boms.compare_mfg("TDK Corporation", "tdk"))
+        self.assertTrue(compare_boms.compare_mfg("AVX", "Kyocera"))
+        self.assertFalse(compare_boms.compare_mfg("AVX", "TDK"))
+        part = load(OLD_BOM).findPart('partnumber', 'AD9361')
+        self.assertEqual(part.mfg_id, compare_boms.mfg_id("ANALOG"))
+
+    def test_legal_forms(self):
+        self.assertEqual(compare_boms.canonical_mfg("Hirose Electric Co Ltd"), "HIROSE")
+        self.assertEqual(compare_boms.canonical_mfg("Acme GmbH"), "ACME")
+        self.assertEqual(compare_boms.canonical_mfg("Acme SA AG"), "ACME SA")
+        self.assertEqual(compare_boms.canonical_mfg("Costar"), "COSTAR")
+        self.assertEqual(compare_boms.canonical_mfg("Inc"), "INC")
+        self.assertFalse(compare_boms.compare_mfg("Acme SA AG", "Acme"))
+
+    def test_load_aliases(self):
+        saved = dict(compare_boms.mfg_aliases)
+        self.addCleanup(compare_boms.add_mfg_aliases, saved)
+        self.addCleanup(compare_boms.mfg_aliases.clear)
+        self.assertFalse(compare_boms.compare_mfg("Murata Manufacturing", "MURATA"))
+        part = load(OLD_BOM.replace('MURATA,GRM-100N', 'Murata Manufacturing,GRM-100N')).findPart('partnumber', 'GRM-100N')
+        self.assertNotEqual(part.mfg_id, compare_boms.mfg_id("MURATA"))
+        compare_boms.load_mfg_aliases(io.StringIO("# alias,manufacturer\nMurata Manufacturing Co,Murata\n"))
+        self.assertTrue(compare_boms.compare_mfg("Murata Manufacturing", "MURATA"))
+        self.assertEqual(part.mfg_id, compare_boms.mfg_id("MURATA"))
+
+
+class TestECO(TestCase):
+
+    def test_eco_to_list(self):
+        lst = load(OLD_BOM).ECOtoList(load(NEW_BOM))
+        self.assertEqual(lst[0], compare_boms.ECO_HEADER)
+        self.assertEqual(lst[1:], [
+            ['remove', 'C1', 'MURATA', 'GRM-100N', '100NF'],
+            ['add', 'C2', '', '', '', 'now', 'MURATA', 'GRM-1U', '1UF'],
+            ['add', 'R3', '', '', '', 'now', 'YAGEO', 'RC0402-10K', '10K']])
+
+    def test_grouped_eco(self):
+        old = load("""Designator,Manufacturer,Part Number,Value,Qty
+C1-C20,MURATA,GRM-100N,100NF,20
+""")
+        new = load("""Designator,Manufacturer,Part Number,Value,Qty
+"C1-C9,C12,C14-C20",MURATA,GRM-100N,100NF,17
+"C10,C11,C13",TDK,C1005-100N,100NF,3
+""")
+        rows = list(compare_boms.iter_eco_rows(old.calculateECO(new), group=True))
+        self.assertEqual(rows, [['pnchg', 'C10,C11,C13', 'MURATA', 'GRM-100N', '100NF',
+                                 'now', 'TDK', 'C1005-100N', '100NF']])
+        out = io.StringIO()
+        old.showECO(new, outfile=out, fmt='jsonl')
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([d['ref'] for d in lines], ['C10', 'C11', 'C13'])
+        self.assertEqual(lines[0]['new_manufacturer'], 'TDK')
+
+    def test_value_notation_is_not_a_change(self):
+        old = load("""Designator,Manufacturer,Part Number,Value,Qty
+C1,MURATA,GRM-1U,1UF,1
+R1,YAGEO,RC0402,4K7,1
+""")
+        new = load("""Designator,Manufacturer,Part Number,Value,Qty
+C1,MURATA,GRM-1U,1.0uF,1
+R1,YAGEO,RC0402,4.7K OHM,1
+""")
+        self.assertEqual(old.calculateECO(new), [])
+        new.parts[1].value = '47K'
+        self.assertEqual([d[1] for d in old.calculateECO(new)], ['R1'])
+
+
+KICAD_NET = """(export (version D)
+  (components
+    (comp (ref R1) (value 10K) (footprint lib:R_0402) (tstamp 1))
+    (comp (ref R2) (value 4.7K) (footprint lib:R_0402) (tstamp 2))
+    (comp (ref C1) (value 100NF) (footprint lib:C_0603) (tstamp 3))
+    (comp (ref C2) (value 1UF) (footprint lib:C_0402) (tstamp 4))
+    (comp (ref U2) (value AD9361) (footprint lib:BGA) (tstamp 5)))
+  (nets
+    (net (code 1) (name GND)
+      (node (ref R2) (pin 2))
+      (node (ref C1) (pin 2)))
+    (net (code 2) (name N1)
+      (node (ref R1) (pin 1)))
+    (net (code 3) (name N2)
+      (node (ref R1) (pin 2))
+      (node (ref C1) (pin 1)))))
+"""
+
+CROSS_BOM = """Designator,Manufacturer,Part Number,Description,Value,Qty,Footprint
+"R1,R2",YAGEO,RC0402-10K,RES 10K,10K,2,R_0402
+C1,MURATA,GRM-100N,CAP 100NF,100NF,1,C_0402
+U1,ANALOG DEVICES INC,AD9361,TRANSCEIVER,AD9361,1,
+"""
+
+
+class TestCrossCheck(TestCase):
+
+    def netlist(self, text=KICAD_NET):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        fname = os.path.join(tmp, 'test.net')
+        with open(fname, 'w') as fo:
+            fo.write(text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return netlist_utils.KicadNetlist(fname)
+
+    def test_cross_check(self):
+        nl = self.netlist()
+        res = load(CROSS_BOM).crossCheck(nl)
+        self.assertEqual(res['bom_only'], ['U1'])
+        self.assertEqual(res['netlist_only'], ['C2', 'U2'])
+        self.assertEqual(res['mismatches'],
+                         [{'ref': 'C1', 'field': 'footprint', 'bom': 'C_0402', 'netlist': 'lib:C_0603'},
+                          {'ref': 'R2', 'field': 'value', 'bom': '10K', 'netlist': '4.7K'}])
+        self.assertEqual(res['dni_connected'], [])
+
+        dni = CROSS_BOM.replace('"R1,R2"', 'R2').replace('RES 10K,10K,2', 'RES 10K,10K,1') \
+            + 'R1,,,DNI,DNI,1,\n'
+        res = load(dni).crossCheck(nl)
+        self.assertEqual(res['dni_connected'], [{'ref': 'R1', 'pins': ['R1.2']}])
+
+    def test_no_value_column(self):
+        nl = self.netlist()
+        bom = load("""Designator,Manufacturer,Part Number,Description,Qty
+R1,YAGEO,RC0402-10K,RES 10K 1% 0402,1
+""")
+        self.assertFalse(bom.has_values)
+        self.assertEqual(bom.crossCheck(nl)['mismatches'], [])
+        self.assertTrue(load(CROSS_BOM).has_values)
+
+    def test_milliohm_value(self):
+        nl = self.netlist(KICAD_NET.replace('(comp (ref R2) (value 4.7K)', '(comp (ref R2) (value 100mOhm)'))
+        bom = load(CROSS_BOM.replace('"R1,R2",YAGEO,RC0402-10K,RES 10K,10K,2',
+                                     'R1,YAGEO,RC0402-10K,RES 10K,10K,1\n'
+                                     'R2,YAGEO,PT0402-R100,SHUNT,100mOhm,1'))
+        self.assertEqual(bom.listByRefDes()['R2'].value, '100MOHM')
+        self.assertEqual([m['ref'] for m in bom.crossCheck(nl)['mismatches']], ['C1'])
+
+    def test_value_details_on_one_side(self):
+        nl = self.netlist()
+        bom = load(CROSS_BOM.replace('CAP 100NF,100NF', 'CAP 100NF,100nF 16V X7R'))
+        self.assertEqual([m['ref'] for m in bom.crossCheck(nl)['mismatches']], ['C1', 'R2'])
+        self.assertEqual([m['field'] for m in bom.crossCheck(nl)['mismatches']], ['footprint', 'value'])
+
+    def test_cli(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        for name, text in [('test.net', KICAD_NET), ('bom.csv', CROSS_BOM)]:
+            with open(os.path.join(tmp, name), 'w') as fo:
+                fo.write(text)
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'kipy', 'compare_boms.py')
+        res = subprocess.run([sys.executable, script, '--netlist', 'test.net', 'bom.csv'], cwd=tmp,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(res.returncode, 0, res.stderr)
+        self.assertIn("In BOM but not netlist: U1", res.stdout.splitlines())
+        self.assertIn("R2: value is 10K in BOM and 4.7K in netlist", res.stdout.splitlines())
+
+
+class TestBatch(TestCase):
+
+    def test_run_bom_batch(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        for name, text in [('old.csv', OLD_BOM), ('new.csv', NEW_BOM), ('bad.csv', 'nothing here\n')]:
+            with open(os.path.join(tmp, name), 'w') as fo:
+                fo.write(text)
+        manifest = os.path.join(tmp, 'manifest.csv')
+        with open(manifest, 'w') as fo:
+            fo.write("OLD,NEW,ECO\n# comment\nold.csv,new.csv,eco1.csv\n\n"
+                     "bad.csv,new.csv,eco2.csv\nnew.csv,old.csv,eco3.csv\n")
+        self.assertEqual(compare_boms.read_bom_manifest(manifest)[0],
+                         (os.path.join(tmp, 'old.csv'), os.path.join(tmp, 'new.csv'),
+                          os.path.join(tmp, 'eco1.csv')))
+        for parallel in [True, False]:
+            res = compare_boms.run_bom_batch(manifest, parallel=parallel, workers=2)
+            self.assertEqual([r['status'] for r in res['results']], ['ok', 'error', 'ok'])
+            self.assertIn('header', res['results'][1]['error'])
+            self.assertEqual(res['totals']['jobs'], 3)
+            self.assertEqual(res['totals']['failed'], 1)
+            self.assertEqual(res['totals']['changes'], 6)
+            with open(os.path.join(tmp, 'eco1.csv'), newline='') as fi:
+                self.assertEqual(list(csv.reader(fi)), load(OLD_BOM).ECOtoList(load(NEW_BOM)))
+
+    def test_changes_count_rows_written(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        job = tuple(os.path.join(tmp, name) for name in ['old.csv', 'new.csv', 'eco.csv'])
+        with open(job[0], 'w') as fo:
+            fo.write(OLD_BOM)
+        with open(job[1], 'w') as fo:
+            fo.write(OLD_BOM.replace('CAP 100NF,100NF', 'CAP 100NF,0.22UF 16V'))
+        for valuechg, changes in [(False, 0), (True, 1)]:
+            res = compare_boms.run_bom_batch([job], valuechg=valuechg)
+            self.assertEqual(res['totals']['changes'], changes)
+            with open(job[2], newline='') as fi:
+                self.assertEqual(len(list(csv.reader(fi))), changes + 1)
+
+    def test_broken_pool_reruns_unfinished_jobs(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        for name, text in [('old.csv', OLD_BOM), ('new.csv', NEW_BOM)]:
+            with open(os.path.join(tmp, name), 'w') as fo:
+                fo.write(text)
+        jobs = [(os.path.join(tmp, 'old.csv'), os.path.join(tmp, 'new.csv'), os.path.join(tmp, 'eco%d.csv' % k))
+                for k in range(3)]
+
+        class BreaksAfterOneJob(object):
+            # runs the first job in this process, then acts like a worker died
+            def __init__(self, max_workers=None):
+                self.submitted = 0
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def submit(self, fn, arg):
+                f = Future()
+                if self.submitted == 0:
+                    f.set_result(fn(arg))
+                else:
+                    f.set_exception(BrokenProcessPool())
+                self.submitted += 1
+                return f
+
+        run_job = compare_boms._run_bom_job
+        calls = []
+        def counted(job):
+            calls.append(job[0][2])
+            return run_job(job)
+        with mock.patch.object(compare_boms, 'ProcessPoolExecutor', BreaksAfterOneJob), \
+                mock.patch.object(compare_boms, '_run_bom_job', counted):
+            res = compare_boms.run_bom_batch(jobs)
+        self.assertEqual(calls, [j[2] for j in jobs])
+        self.assertEqual(res['totals']['ok'], 3)
+
+
+class TestBOMTree(TestCase):
+
+    def tree(self, **texts):
+        return compare_boms.BOMTree(dict((name, load(text)) for name, text in texts.items()))
+
+    def test_explode(self):
+        tree = self.tree(
+            top="""Designator,Manufacturer,Part Number,Value,Qty
+"A1,A2",ACME,radio,,2
+A3,ACME,psu,,1
+R1,YAGEO INC,RC0402-10K,10K,1
+X1,,,DNI,1
+""",
+            radio="""Designator,Manufacturer,Part Number,Value,Qty
+"R1,R2",Yageo,RC0402-10K,10K,2
+A1,ACME,PSU,,1
+U1,ANALOG DEVICES INC,AD9361,,1
+""",
+            psu="""Designator,Manufacturer,Part Number,Value,Qty
+"C1-C4",MURATA,GRM-1U,1UF,4
+""")
+        self.assertEqual(tree.explode('top'), {('YAGEO', 'RC0402-10K'): 5,
+                                               ('ANALOG', 'AD9361'): 2,
+                                               ('MURATA', 'GRM-1U'): 12})
+        self.assertEqual(tree.explode({'top': 10, 'psu': 1})[('MURATA', 'GRM-1U')], 124)
+        out = io.StringIO()
+        tree.write_csv(out, 'radio')
+        self.assertEqual(out.getvalue().splitlines(),
+                         ['Manufacturer,Part Number,Qty', 'ANALOG,AD9361,1',
+                          'MURATA,GRM-1U,4', 'YAGEO,RC0402-10K,2'])
+        self.assertRaises(KeyError, tree.explode, 'nope')
+
+    def test_cycle(self):
+        tree = self.tree(
+            top="""Designator,Manufacturer,Part Number,Qty
+A1,ACME,A,1
+""",
+            a="""Designator,Manufacturer,Part Number,Qty
+A1,ACME,B,1
+""",
+            b="""Designator,Manufacturer,Part Number,Qty
+A1,ACME,A,1
+""")
+        with self.assertRaises(compare_boms.BOMCycle) as cm:
+            tree.explode('top')
+        self.assertIn('A -> B -> A', str(cm.exception))
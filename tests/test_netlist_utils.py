@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+import contextlib
+from unittest import TestCase
+
+from kipy import netlist_utils
+from kipy import compare_boms
+
+KICAD_NET = """(export (version D)
+  (components
+    (comp (ref C1) (value 1UF) (footprint lib:C_0402) (tstamp 1))
+    (comp (ref C2) (value 1.0uF) (footprint lib:C_0402) (tstamp 2))
+    (comp (ref C3) (value 1u) (footprint lib:C_0402) (tstamp 3))
+    (comp (ref C5) (value 1UF) (footprint lib:C_0603) (tstamp 4))
+    (comp (ref C10) (value 1UF) (footprint lib:C_0402) (tstamp 5))
+    (comp (ref R1) (value 10K) (footprint lib:R_0402) (tstamp 6))
+    (comp (ref U1) (value AD9361) (footprint lib:BGA) (tstamp 7)))
+  (nets
+    (net (code 1) (name GND)
+      (node (ref C1) (pin 2))
+      (node (ref R1) (pin 2)))))
+"""
+
+
+class TestBOM(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.fname = os.path.join(tmp, 'test.net')
+        with open(self.fname, 'w') as fo:
+            fo.write(KICAD_NET)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.nl = netlist_utils.KicadNetlist(self.fname)
+
+    def test_get_bom(self):
+        lines = self.nl.get_bom()
+        self.assertEqual([(str(l['refs']), l['qty'], l['value'], l['footprint']) for l in lines],
+                         [('C1-C3,C10', 4, '1UF', 'C_0402'),
+                          ('C5', 1, '1UF', 'C_0603'),
+                          ('R1', 1, '10K', 'R_0402'),
+                          ('U1', 1, 'AD9361', 'BGA')])
+        self.assertEqual(self.nl.get_bom(keep_lib=True)[0]['footprint'], 'lib:C_0402')
+
+    def test_save_bom_reads_back(self):
+        out = io.StringIO()
+        self.nl.save_bom(out)
+        out.seek(0)
+        bom = compare_boms.BOM(out)
+        self.assertEqual(sorted(bom.listByRefDes()),
+                         ['C1', 'C10', 'C2', 'C3', 'C5', 'R1', 'U1'])
+        self.assertEqual(bom.listByRefDes()['C10'].footprint, 'C_0402')
+        self.assertEqual(bom.crossCheck(self.nl)['mismatches'], [])
+
+
+OLD_NET = """*PADS-PCB*
+*PART*
+R1 R0402
+R2 R0402
+U1 QFN16
+*NET*
+*SIGNAL* VCC
+U1.1 R1.1
+*SIGNAL* SIG
+U1.3 R1.2 R2.1
+*SIGNAL* GND
+U1.2 R2.2
+*END*
+"""
+
+NEW_NET = """*PADS-PCB*
+*PART*
+R1 R0402
+R2 R0402
+U1 QFN16
+*NET*
+*SIGNAL* VCC
+U1.1 R1.1 R2.2
+*SIGNAL* SIG_RENAMED
+U1.3 R1.2 R2.1
+*SIGNAL* GND
+U1.2
+*END*
+"""
+
+
+class TestCompareNodes(TestCase):
+
+    def test_compare_nodes(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        cwd = os.getcwd()
+        os.chdir(tmp)   # correlate_nets() writes corr_nets.txt to cwd
+        self.addCleanup(os.chdir, cwd)
+        files = []
+        for name, text in [('old.NET', OLD_NET), ('new.NET', NEW_NET)]:
+            with open(name, 'w') as fo:
+                fo.write(text)
+            files.append(name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            nl1 = netlist_utils.PadsNetlist(files[0])
+            nl2 = netlist_utils.PadsNetlist(files[1])
+        netcat, node_dict = netlist_utils.compare_nodes(nl1, nl2)
+        self.assertEqual(netcat['name_changed'], ['SIG_RENAMED'])
+        self.assertEqual(netcat['changed'], ['VCC'])
+        self.assertEqual(node_dict, {'R2.2': {'status': 'moved', 'from': 'GND', 'to': 'VCC'}})
@@ -1,2 +1,97 @@
+import io
 from unittest import TestCase
 
+from kipy.sch_utils import Schematic, Component
+
+SCH = """EESchema Schematic File Version 4
+LIBS:power
+EELAYER 26 0
+EELAYER END
+$Descr A4 11693 8268
+encoding utf-8
+Sheet 1 1
+Title "test"
+Date ""
+Rev ""
+$EndDescr
+$Comp
+L Device:R R1
+U 1 1 5C0F1A01
+P 1000 2000
+F 0 "R1" H 1070 2046 50  0000 L CNN
+F 1 "10K" H 1070 1955 50  0000 L CNN
+F 2 "Resistor_SMD:R_0402_1005Metric" V 930 2000 50  0001 C CNN
+F 3 "~" H 1000 2000 50  0001 C CNN
+F 4 "RC0402FR-0710KL" H 1000 2000 50  0001 C CNN "MPN"
+	1    1000 2000
+	1    0    0    -1
+$EndComp
+$Comp
+L Device:C C1
+U 1 1 5C0F1A02
+P 1500 2000
+F 0 "C1" H 1570 2046 50  0000 L CNN
+F 1 "100nF" H 1570 1955 50  0000 L CNN
+F 2 "Capacitor_SMD:C_0402_1005Metric" H 1500 2000 50  0001 C CNN
+F 3 "~" H 1500 2000 50  0001 C CNN
+	1    1500 2000
+	1    0    0    -1
+$EndComp
+$Comp
+L Device:R R2
+U 2 1 5C0F1A03
+P 2000 2000
+F 0 "R2" H 2070 2046 50  0000 L CNN
+F 1 "10K" H 2070 1955 50  0000 L CNN
+F 2 "Resistor_SMD:R_0603_1608Metric" V 1930 2000 50  0001 C CNN
+F 3 "~" H 2000 2000 50  0001 C CNN
+	1    2000 2000
+	1    0    0    -1
+$EndComp
+$EndSCHEMATC
+"""
+
+
+class TestComponent(TestCase):
+
+    def setUp(self):
+        self.sch = Schematic(io.StringIO(SCH))
+
+    def test_header_lines(self):
+        comp = self.sch.components[0]
+        self.assertEqual((comp.lib_id, comp.ref, comp.unit, comp.convert, comp.timestamp, comp.x, comp.y),
+                         ('Device:R', 'R1', 1, 1, '5C0F1A01', 1000, 2000))
+        self.assertEqual(self.sch.components[2].unit, 2)
+        self.assertFalse(hasattr(comp, '__dict__'))
+
+    def test_fields_are_lazy(self):
+        comp = self.sch.components[0]
+        self.assertIsNone(comp._fields)
+        self.assertEqual(comp.value, '10K')
+        self.assertEqual(comp.footprint, 'Resistor_SMD:R_0402_1005Metric')
+        self.assertEqual(comp.field('MPN'), 'RC0402FR-0710KL')
+        self.assertIsNone(comp.field('Nope'))
+        fields = comp.fields
+        self.assertIs(comp.fields, fields)
+        self.assertEqual([(f.number, f.name) for f in fields],
+                         [(0, 'Reference'), (1, 'Value'), (2, 'Footprint'), (3, 'Datasheet'), (4, 'MPN')])
+        self.assertEqual((fields[2].orientation, fields[2].x, fields[2].flags, fields[2].justify),
+                         ('V', 930, '0001', 'C CNN'))
+
+    def test_escaped_quotes(self):
+        comp = Component('$Comp\nL Device:R R1\nF 4 "say \\"hi\\"" H 0 0 50  0001 C CNN "Note"\n$EndComp\n')
+        self.assertEqual(comp.field('Note'), 'say "hi"')
+
+
+class TestQueries(TestCase):
+
+    def test_find_components(self):
+        sch = Schematic(io.StringIO(SCH))
+        refs = lambda comps: [c.ref for c in comps]
+        self.assertEqual(refs(sch.find_components(footprint='Resistor_SMD:R_0402_1005Metric')), ['R1'])
+        self.assertEqual(refs(sch.find_components(footprint='Resistor_SMD:*')), ['R1', 'R2'])
+        self.assertEqual(refs(sch.find_components(value='10K', lib_id='Device:R')), ['R1', 'R2'])
+        self.assertEqual(refs(sch.find_components(MPN='RC0402*')), ['R1'])
+        self.assertEqual(sch.find_components(value='1UF'), [])
+        self.assertEqual(len(sch.find_components()), 3)
+        self.assertIs(sch.index('footprint'), sch.index('footprint'))
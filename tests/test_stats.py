@@ -0,0 +1,67 @@
+import io
+import os
+import contextlib
+from unittest import TestCase
+
+from kipy import netlist_utils
+from kipy.stats import Stats, NULL_STATS, get_stats
+
+NETLIST_DIR = os.path.join(os.path.dirname(__file__), "..", "kipy", "netlist_files")
+PADS_FILE = os.path.join(NETLIST_DIR, "pi-hat-lna_pads.NET")
+
+
+class TestStats(TestCase):
+
+    def test_timer_accumulates_calls(self):
+        st = Stats()
+        for k in range(3):
+            with st.timer("parse"):
+                st.count("nodes_parsed", 10)
+        self.assertEqual(st.timings["parse"][1], 3)
+        self.assertEqual(st.counters["nodes_parsed"], 30)
+        self.assertIn("parse", st.report())
+
+    def test_get_stats(self):
+        self.assertIs(get_stats(None), NULL_STATS)
+        self.assertIsInstance(get_stats(True), Stats)
+        st = Stats()
+        self.assertIs(get_stats(st), st)
+
+    def test_null_stats_records_nothing(self):
+        with NULL_STATS.timer("parse"):
+            NULL_STATS.count("nodes_parsed")
+        self.assertEqual(len(NULL_STATS.timings), 0)
+        self.assertEqual(len(NULL_STATS.counters), 0)
+
+    def test_null_stats_merge_does_nothing(self):
+        st = Stats()
+        st.add_time("parse", 1.0)
+        st.count("nodes_parsed", 5)
+        self.assertIs(NULL_STATS.merge(st), NULL_STATS)
+        self.assertEqual(len(NULL_STATS.timings), 0)
+        self.assertEqual(len(NULL_STATS.counters), 0)
+
+    def test_diff_nets_fills_stats(self):
+        st = Stats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            nl1 = netlist_utils.PadsNetlist(PADS_FILE)
+            nl2 = netlist_utils.PadsNetlist(PADS_FILE)
+            added = netlist_utils.diff_nets(nl1, nl2, stats=st)
+            plain = netlist_utils.diff_nets(nl1, nl2)
+        self.assertEqual(added, [])
+        self.assertEqual(plain, [])
+        self.assertIn("correlate", st.timings)
+        self.assertIn("render.nets", st.timings)
+        self.assertGreater(st.counters["pairs_scored"], 0)
+
+    def test_memory_mode_records_nested_phases(self):
+        st = Stats(memory=True)
+        with st.timer("outer"):
+            with st.timer("inner"):
+                big = [0] * 100000
+            del big
+        self.assertGreater(st.memory["inner"]["peak"], 100000)
+        self.assertGreaterEqual(st.memory["outer"]["peak"], st.memory["inner"]["peak"])
+        self.assertLess(st.memory["outer"]["retained"], st.memory["inner"]["retained"])
+        self.assertIn("PEAK KB", st.report())
+        self.assertIn("memory", st.as_dict())
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from kipy import value_utils
+from kipy.value_utils import EngValue, parse_value, parse_values, values_equal, value_key
+
+
+class TestParseValue(TestCase):
+
+    def test_notations(self):
+        for text, number, unit in [('10K', 1e4, ''),
+                                   ('4K7', 4.7e3, ''),
+                                   ('4R7', 4.7, 'OHM'),
+                                   ('0R', 0.0, 'OHM'),
+                                   ('1MEG', 1e6, ''),
+                                   ('1M', 1e6, ''),
+                                   ('1MH', 1e-3, 'H'),
+                                   ('2.2uH', 2.2e-6, 'H'),
+                                   ('.1uF', 1e-7, 'F'),
+                                   ('2N2', 2.2e-9, ''),
+                                   ('10K OHM', 1e4, 'OHM'),
+                                   ('1µF', 1e-6, 'F'),
+                                   ('1µF'.upper(), 1e-6, 'F'),
+                                   (8, 8.0, '')]:
+            v = parse_value(text)
+            self.assertEqual((v.number, v.unit), (number, unit), text)
+
+    def test_suffixes(self):
+        self.assertEqual(parse_value('22PF 5% 50V C0G'), EngValue(2.2e-11, 'F', 5.0, 50.0, ('C0G',)))
+        self.assertEqual(parse_value('100nF/16V'), EngValue(1e-7, 'F', None, 16.0, ()))
+        self.assertEqual(parse_value('10K +/-1%').tolerance, 1.0)
+
+    def test_not_values(self):
+        for text in ['AD9361', 'DNI', '1N4148', '2N2222', '', '16V', '0603', '0402']:
+            self.assertIsNone(parse_value(text), text)
+
+    def test_footprint_size(self):
+        self.assertEqual(parse_value('100nF 0603'), EngValue(1e-7, 'F', None, None, ('0603',)))
+        self.assertEqual(parse_value('0603 100nF'), EngValue(1e-7, 'F', None, None, ('0603',)))
+        self.assertEqual(parse_value('0.1').number, 0.1)
+        self.assertEqual(parse_value('0').number, 0.0)
+
+    def test_cache(self):
+        value_utils.clear_cache()
+        values = parse_values(['1UF', '10K', '1UF'])
+        self.assertIs(values[0], values[2])
+        self.assertEqual(len(value_utils._value_cache), 2)
+
+
+class TestValuesEqual(TestCase):
+
+    def test_equal(self):
+        self.assertTrue(values_equal('1UF', '1.0uF'))
+        self.assertTrue(values_equal('1UF', '1u'))
+        self.assertTrue(values_equal('4K7', '4.7K OHM'))
+        self.assertTrue(values_equal('ad9361', 'AD9361'))
+        self.assertTrue(values_equal('100nF 16V X7R', '100nF'))
+        self.assertTrue(values_equal('10K 1%', '10K 0402'))
+        self.assertEqual(value_key('100NF'), value_key('0.1UF'))
+
+    def test_value_key_without_unit(self):
+        self.assertEqual(value_key('1u'), value_key('1UF'))
+        self.assertEqual(value_key('4K7'), value_key('4.7K OHM'))
+        self.assertNotEqual(value_key('1u'), value_key('1UF 16V'))
+        self.assertNotEqual(value_key('10K'), value_key('10UF'))
+
+    def test_upper_case_milliohm(self):
+        # BOM values are upper cased, 100mOhm becomes 100MOHM
+        self.assertIsNone(parse_value('100MOHM'))
+        self.assertIsNone(parse_value('100M OHM'))
+        self.assertEqual(parse_value('100mOhm').number, 0.1)
+        self.assertTrue(values_equal('100MOHM', '100mOhm'))
+        self.assertFalse(values_equal('100MOHM', '10mOhm'))
+
+    def test_not_equal(self):
+        self.assertFalse(values_equal('10K', '10UF'))
+        self.assertFalse(values_equal('100NF 16V', '100NF 25V'))
+        self.assertFalse(values_equal('100NF X7R', '100NF X5R'))
+        self.assertFalse(values_equal('10K', 'DNI'))
+
+
+class TestCompareValues(TestCase):
+
+    def test_netlist_values(self):
+        from types import SimpleNamespace
+        from kipy import netlist_utils
+
+        def netlist(values):
+            comps = [SimpleNamespace(ref=ref, value=value) for ref, value in values]
+            return SimpleNamespace(list_of_comps=SimpleNamespace(components=comps))
+
+        nl1 = netlist([('C1', '1UF'), ('R10', '4K7'), ('R2', '10K'), ('U1', 'AD9361')])
+        nl2 = netlist([('C1', '1.0uF'), ('R10', '4.7K'), ('R2', '12K'), ('U1', 'AD9364')])
+        self.assertEqual(netlist_utils.compare_values(nl1, nl2),
+                         [{'ref': 'R2', 'old': '10K', 'new': '12K'},
+                          {'ref': 'U1', 'old': 'AD9361', 'new': 'AD9364'}])